@@ -12,5 +12,7 @@ echo "db upgrade"
 flask db upgrade
 echo "create roles"
 flask roles create
+echo "history partitions"
+flask history partitions
 
 echo "stop"
\ No newline at end of file
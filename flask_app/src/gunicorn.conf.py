@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # метрики Gauge завершившегося воркера не должны попадать в live-агрегаты /metrics
+    multiprocess.mark_process_dead(worker.pid)
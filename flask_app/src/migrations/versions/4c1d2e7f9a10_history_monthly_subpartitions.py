@@ -0,0 +1,81 @@
+"""history_monthly_subpartitions
+
+Revision ID: 4c1d2e7f9a10
+Revises: 93f91144856e
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from project import settings
+from project.services.history_partitions import HISTORY_PLATFORMS, ensure_partitions
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1d2e7f9a10'
+down_revision = '93f91144856e'
+branch_labels = None
+depends_on = None
+
+
+def _backup_history():
+    op.execute(
+        'CREATE TEMP TABLE user_history_backup AS '
+        'SELECT id, created, user_id, activity, platform FROM user_history'
+    )
+    op.drop_table('user_history')
+
+
+def upgrade():
+    connection = op.get_bind()
+    _backup_history()
+
+    op.create_table('user_history',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('activity', sa.String(), nullable=False),
+    sa.Column('platform', sa.String(), server_default='other', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'platform', 'created'),
+    postgresql_partition_by='LIST (platform)'
+    )
+    op.create_index(op.f('ix_user_history_user_id'), 'user_history', ['user_id'], unique=False)
+
+    since = connection.execute(sa.text('SELECT min(created) FROM user_history_backup')).scalar()
+    ensure_partitions(connection,
+                      months_ahead=settings.HISTORY_PARTITIONS_AHEAD_MONTHS,
+                      since=since.date() if since else None)
+
+    platforms = ', '.join(f"'{platform}'" for platform in HISTORY_PLATFORMS)
+    op.execute(
+        'INSERT INTO user_history (id, created, user_id, activity, platform) '
+        'SELECT id, coalesce(created, now()), user_id, activity, '
+        f"CASE WHEN platform IN ({platforms}) THEN platform ELSE 'other' END "
+        'FROM user_history_backup'
+    )
+    op.execute('DROP TABLE user_history_backup')
+
+
+def downgrade():
+    _backup_history()
+
+    op.create_table('user_history',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('activity', sa.String(), nullable=False),
+    sa.Column('platform', sa.String(), server_default='other', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id'),
+    sa.UniqueConstraint('id', 'platform')
+    )
+    op.create_index(op.f('ix_user_history_user_id'), 'user_history', ['user_id'], unique=False)
+    op.execute(
+        'INSERT INTO user_history (id, created, user_id, activity, platform) '
+        'SELECT id, created, user_id, activity, platform FROM user_history_backup'
+    )
+    op.execute('DROP TABLE user_history_backup')
@@ -0,0 +1,27 @@
+"""history_keyset_index
+
+Revision ID: 8b3f0c5d2e61
+Revises: 4c1d2e7f9a10
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f0c5d2e61'
+down_revision = '4c1d2e7f9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_history_user_id_created_id', 'user_history',
+                    ['user_id', sa.text('created DESC'), sa.text('id DESC')], unique=False)
+    op.drop_index(op.f('ix_user_history_user_id'), table_name='user_history')
+
+
+def downgrade():
+    op.create_index(op.f('ix_user_history_user_id'), 'user_history', ['user_id'], unique=False)
+    op.drop_index('ix_user_history_user_id_created_id', table_name='user_history')
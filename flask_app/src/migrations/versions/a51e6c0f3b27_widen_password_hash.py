@@ -0,0 +1,30 @@
+"""widen_password_hash
+
+Revision ID: a51e6c0f3b27
+Revises: 8b3f0c5d2e61
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a51e6c0f3b27'
+down_revision = '8b3f0c5d2e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('users', 'password_hashed',
+                    existing_type=sa.String(length=128),
+                    type_=sa.String(length=255),
+                    existing_nullable=False)
+
+
+def downgrade():
+    op.alter_column('users', 'password_hashed',
+                    existing_type=sa.String(length=255),
+                    type_=sa.String(length=128),
+                    existing_nullable=False)
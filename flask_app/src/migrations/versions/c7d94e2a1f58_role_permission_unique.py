@@ -0,0 +1,34 @@
+"""role_permission_unique
+
+Revision ID: c7d94e2a1f58
+Revises: a51e6c0f3b27
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d94e2a1f58'
+down_revision = 'a51e6c0f3b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # из дублей (role_id, permission_id) остается последняя записанная строка
+    op.execute(
+        'DELETE FROM role_permission WHERE id IN ('
+        'SELECT id FROM ('
+        'SELECT id, row_number() OVER ('
+        'PARTITION BY role_id, permission_id ORDER BY created DESC NULLS LAST, id DESC'
+        ') AS position FROM role_permission'
+        ') duplicates WHERE position > 1'
+        ')'
+    )
+    op.create_unique_constraint('uq_role_permission_role_id_permission_id', 'role_permission',
+                                ['role_id', 'permission_id'])
+
+
+def downgrade():
+    op.drop_constraint('uq_role_permission_role_id_permission_id', 'role_permission', type_='unique')
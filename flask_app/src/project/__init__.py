@@ -1,17 +1,10 @@
 import os
-from datetime import datetime, timezone, timedelta
+from datetime import timedelta
 
-import redis
 from apifairy import APIFairy
 from flask import Flask, json
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth
-from flask_jwt_extended import (
-    JWTManager,
-    get_jwt,
-    create_access_token,
-    get_jwt_identity,
-    set_access_cookies,
-)
+from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
@@ -22,6 +15,7 @@ from werkzeug.exceptions import HTTPException
 # but without any arguments passed in. These instances are not
 # attached to the Flask application at this point.
 from project.core.config import settings
+from project.utils.redis_pool import create_redis_client
 
 # -------------
 # Configuration
@@ -34,7 +28,7 @@ migrate = Migrate()
 basic_auth = HTTPBasicAuth()
 token_auth = HTTPTokenAuth()
 jwt = JWTManager()
-redis = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+redis = create_redis_client()
 
 
 # ------------
@@ -87,22 +81,26 @@ def initialize_extensions(app):
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(settings.REFRESH_EXPIRES_IN_DAYS)
     jwt.init_app(app=app)
 
-    @app.after_request
-    def refresh_expiring_jwts(response):
-        try:
-            exp_timestamp = get_jwt()["exp"]
-            now = datetime.now(timezone.utc)
-            target_timestamp = datetime.timestamp(now + timedelta(minutes=30))
-            if target_timestamp > exp_timestamp:
-                access_token = create_access_token(identity=get_jwt_identity())
-                set_access_cookies(response, access_token)
-            return response
-        except (RuntimeError, KeyError):
-            return response
+    from project.services.signing_keys import signing_keys
+    signing_keys.init_app(app)
+
+    from project.utils.rate_limiter import set_rate_limit_headers
+    app.after_request(set_rate_limit_headers)
+
+    if settings.METRICS_ENABLED:
+        from project.utils.instrumentation import init_metrics
+        init_metrics(app)
+
+    if settings.REQUEST_COUNTERS_HEADERS:
+        from project.utils.instrumentation import init_request_counters
+        init_request_counters(app)
 
     import project.models
     migrate.init_app(app, database)
 
+    from project.services.history_writer import history_writer
+    history_writer.init_app(app)
+
     # add tracer
 
 
@@ -111,12 +109,14 @@ def register_blueprints(app):
     from project.api.v1.role import role_api_blueprint
     from project.api.v1.users import users_api_blueprint
     from project.api.v1.auth import auth_api_blueprint
+    from project.api.well_known import well_known_blueprint
 
     # Since the application instance is now created, register each Blueprint
     # with the Flask application instance (app)
     app.register_blueprint(auth_api_blueprint, url_prefix='/api/v1/auth')
     app.register_blueprint(users_api_blueprint, url_prefix='/api/v1/users')
     app.register_blueprint(role_api_blueprint, url_prefix='/api/v1/roles')
+    app.register_blueprint(well_known_blueprint, url_prefix='/.well-known')
 
 
 def register_error_handlers(app):
@@ -138,9 +138,17 @@ def register_error_handlers(app):
 def register_cli_command(app):
     from project.cli.superuser import user_cli
     from project.cli.default_roles import roles_cli
+    from project.cli.history import history_cli
+    from project.cli.passwords import passwords_cli
+    from project.cli.perfdata import perfdata_cli
+    from project.cli.keys import keys_cli
 
     app.cli.add_command(user_cli)
     app.cli.add_command(roles_cli)
+    app.cli.add_command(history_cli)
+    app.cli.add_command(passwords_cli)
+    app.cli.add_command(perfdata_cli)
+    app.cli.add_command(keys_cli)
 
 
 def configure_tracer(app):
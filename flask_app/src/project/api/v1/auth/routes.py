@@ -1,15 +1,22 @@
+import math
+import time
+import uuid
 from datetime import timedelta
 from http import HTTPStatus
 
 from apifairy import response, body
-from flask import abort, url_for, redirect, request
-from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+from flask import Response, abort, g, url_for, redirect, request
+from flask_jwt_extended import get_jwt, jwt_required
 
+from project import database
 from project.core.config import settings
-from project.extensions import jwt_redis_blocklist, log_activity
+from project.extensions import issue_tokens, log_activity, revocation_filter
 from project.models.models import User
 from project.schemas import token_schema, message_schema, login_schema
+from project.services.refresh_tokens import EXPIRED, REUSED, THROTTLED, refresh_token_families
 from project.services.social_auth import ExternalAuthActions
+from project.services.token_introspection import TOKEN_REASONS, introspect_tokens
+from project.services.user_cache import user_state_cache
 from project.utils.parsed_user_agent import get_platform
 from project.utils.rate_limiter import rate_limit
 from . import auth_api_blueprint
@@ -33,11 +40,71 @@ def login(kwargs):
 
     if not user.is_password_correct(password):
         abort(HTTPStatus.EXPECTATION_FAILED, 'password is incorrect')
-    additional_claims = {'role_id': user.role_id}
-    access_token = create_access_token(identity=email, additional_claims=additional_claims)
+
+    # пароль известен только сейчас: хэш по устаревшей схеме или параметрам пересчитывается при входе
+    if user.password_needs_rehash():
+        user.set_password(password)
+        database.session.commit()
+
+    tokens = issue_tokens(email, user)
 
     log_activity(user_id=user.id, activity='login', platform=get_platform(request.user_agent.string))
-    return dict(token=access_token)
+    return tokens
+
+
+@auth_api_blueprint.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+@rate_limit(by_ip=True)
+@response(token_schema, HTTPStatus.OK)
+def refresh():
+    """Refresh endpoint: rotates the refresh token and issues a new access token"""
+    jwt = get_jwt()
+    family = jwt.get('family')
+    if not family:
+        abort(HTTPStatus.UNAUTHORIZED, 'refresh token is not bound to a session')
+
+    email = jwt['sub']
+    user = user_state_cache.get(email, user_id=jwt.get('user_id'))
+    if not user or user.disabled:
+        refresh_token_families.revoke(family)
+        abort(HTTPStatus.NOT_FOUND, f'user with email={email} not found')
+
+    new_jti = str(uuid.uuid4())
+    result = refresh_token_families.rotate(family, jwt['jti'], new_jti)
+    if result.status == REUSED:
+        abort(HTTPStatus.UNAUTHORIZED, 'refresh token has already been used, session revoked')
+    if result.status == EXPIRED:
+        abort(HTTPStatus.UNAUTHORIZED, 'session expired or revoked')
+    if result.status == THROTTLED:
+        g.rate_limit_headers = {**g.get('rate_limit_headers', {}),
+                                'Retry-After': str(max(1, math.ceil(result.retry_after)))}
+        abort(HTTPStatus.TOO_MANY_REQUESTS, 'tokens of this session were refreshed too recently')
+
+    return issue_tokens(email, user, family=family, refresh_jti=new_jti)
+
+
+@auth_api_blueprint.route('/verify', methods=['GET'])
+def verify():
+    """Token check for nginx auth_request: 204 with X-User-Id and X-Role-Id, 401 or 403 without a body"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer' or not token:
+        return Response(status=HTTPStatus.UNAUTHORIZED, headers={'Cache-Control': 'no-store'})
+
+    # те же проверки, что у /users/check_access, но без marshmallow и apifairy: nginx нужны только статус и заголовки
+    verdict = introspect_tokens([token])[0]
+    if not verdict['valid']:
+        status = HTTPStatus.UNAUTHORIZED if verdict['reason'] in TOKEN_REASONS else HTTPStatus.FORBIDDEN
+        return Response(status=status, headers={'Cache-Control': 'no-store'})
+
+    # положительный вердикт nginx кэширует по токену, но не дольше срока его жизни и AUTH_VERIFY_CACHE_SECONDS:
+    # столько может пройти от отзыва токена до отказа на краю
+    max_age = min(settings.AUTH_VERIFY_CACHE_SECONDS, verdict['expires'] - int(time.time()))
+    return Response(status=HTTPStatus.NO_CONTENT, headers={
+        'X-User-Id': verdict['user_id'],
+        'X-Role-Id': verdict['role_id'],
+        'Cache-Control': f'max-age={max_age}' if max_age > 0 else 'no-store',
+        'Vary': 'Authorization',
+    })
 
 
 @auth_api_blueprint.route('/logout', methods=['DELETE'])
@@ -48,9 +115,11 @@ def logout():
     """Logout endpoint"""
     jwt = get_jwt()
     jti = jwt['jti']
-    jwt_redis_blocklist.set(jti, '', ex=timedelta(settings.ACCESS_EXPIRES_IN_HOURS))
+    revocation_filter.revoke(jti, expires=timedelta(settings.ACCESS_EXPIRES_IN_HOURS))
+    if jwt.get('family'):
+        refresh_token_families.revoke(jwt['family'])
     email = jwt['sub']
-    user = User.query.filter_by(email=email).first()
+    user = user_state_cache.get(email, user_id=jwt.get('user_id'))
 
     if not user:
         abort(HTTPStatus.NOT_FOUND, f'user with email={email} not found')
@@ -77,8 +146,7 @@ def authorize(provider: str):
         reg_url = url_for('users.register')
         return redirect(reg_url, HTTPStatus.FOUND)
 
-    additional_claims = {'role_id': user.role_id}
-    access_token = create_access_token(identity=email, additional_claims=additional_claims)
+    tokens = issue_tokens(email, user)
 
     log_activity(user_id=user.id, activity=f'login with {provider}', platform=get_platform(request.user_agent.string))
-    return dict(token=access_token)
+    return tokens
@@ -10,6 +10,8 @@ from project.extensions import check_access
 from project.models.models import Role, RolePermission
 from project.schemas import role_schema, new_role_schema
 from project.schemas.role import ShortRoleSchema
+from project.services.permission_matrix import permission_matrix
+from project.services.role_cache import role_cache
 from project.utils.rate_limiter import rate_limit
 from . import role_api_blueprint
 
@@ -37,6 +39,7 @@ def create_role(kwargs: dict):
     RolePermission.set_permissions_to_role(role.id, permissions)
 
     database.session.commit()
+    permission_matrix.invalidate()
 
     return role
 
@@ -63,6 +66,7 @@ def update_role(kwargs: dict, role_id: str):
         RolePermission.set_permissions_to_role(role.id, permission_list)
 
     database.session.commit()
+    permission_matrix.invalidate()
 
     return role
 
@@ -74,7 +78,7 @@ def update_role(kwargs: dict, role_id: str):
 @check_access([ROLE_SELF.READ, ROLE_ALL.READ])
 def get_all_roles():
     """List all roles"""
-    roles = Role.query.order_by(Role.name).all()
+    roles = role_cache.all()
     if not roles:
         abort(HTTPStatus.NOT_FOUND, 'roles not found')
 
@@ -88,13 +92,11 @@ def get_all_roles():
 @check_access([ROLE_SELF.READ, ROLE_ALL.READ])
 def get_role(role_id: str):
     """Get role info"""
-    role = Role.query.get(role_id)
+    role = role_cache.get(role_id)
     if not role:
         abort(HTTPStatus.NOT_FOUND, f'role with role_id={role_id} not found')
 
-    role_permissions = RolePermission.query.filter_by(role_id=role_id).all()
-
-    return dict(id=role.id, name=role.name, created=role.created, permissions=role_permissions)
+    return role
 
 
 @role_api_blueprint.route('/<role_id>', methods=['DELETE'])
@@ -108,12 +110,9 @@ def delete_role(role_id: str):
     if not role:
         abort(HTTPStatus.NOT_FOUND, f'role with role_id={role_id} not found')
 
-    role_permissions = RolePermission.query.filter_by(role_id=role_id).all()
-    for role_permission in role_permissions:
-        database.session.delete(role_permission)
-    database.session.commit()
-
+    # пермишены роли удаляются каскадом по связи Role.role_permissions
     database.session.delete(role)
     database.session.commit()
+    permission_matrix.invalidate()
 
     return role
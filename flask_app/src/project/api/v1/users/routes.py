@@ -1,20 +1,22 @@
+import uuid
+from datetime import datetime
 from http import HTTPStatus
 
 from apifairy import (
+    arguments,
     body,
     response,
 )
-from flask import abort
+from flask import Response, abort, json, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt
+from sqlalchemy import tuple_
 
-from project import database
+from project import database, settings
 from project.core.permissions import USER_SELF, USER_ALL
-from project.extensions import check_access, jwt_redis_blocklist
+from project.extensions import check_access
 from project.models.models import (
     User,
     Role,
-    RolePermission,
-    Permission,
     UserHistory,
 )
 from project.schemas import (
@@ -27,12 +29,20 @@ from project.schemas import (
     pagination_schema,
     paginated_history_schema,
     message_schema,
+    token_batch_schema,
+    token_batch_verdict_schema,
 )
+from project.services.role_cache import role_cache
+from project.services.token_introspection import introspect_tokens
+from project.services.user_cache import user_state_cache
+from project.utils.cursor import decode_cursor, encode_cursor
 from project.utils.rate_limiter import rate_limit
 from project.validators.email import EmailValidator
 from project.validators.password import PasswordValidator
 from . import users_api_blueprint
 
+USERS_STREAM_CHUNK_SIZE = 1000
+
 
 @users_api_blueprint.route('/register', methods=['POST'])
 @body(new_user_schema)
@@ -92,10 +102,12 @@ def update_user(kwargs, user_id: str):
     if new_password != new_password_confirm:
         abort(HTTPStatus.EXPECTATION_FAILED, 'passwords do not match')
 
+    old_email = user.email
     user.email = email
     user.set_password(new_password)
 
     database.session.commit()
+    user_state_cache.invalidate(old_email, email)
 
     return user
 
@@ -112,22 +124,65 @@ def disable_user(user_id: str):
 
     user.disable()
     database.session.commit()
+    user_state_cache.invalidate(user.email)
 
     return user
 
 
 @users_api_blueprint.route('/', methods=['GET'])
 @jwt_required()
+@arguments(pagination_schema)
 @response(UserSchema(many=True), HTTPStatus.OK)
 @rate_limit(by_email=True, by_ip=True)
 @check_access(USER_ALL.READ)
-def get_all_users():
-    """Disable user"""
-    users = User.query.order_by(User.email).all()
-    if not users:
+def get_all_users(kwargs):
+    """List users page by page, next page cursor is returned in X-Next-Cursor header"""
+    per_page = kwargs.get('per_page', 10)
+    cursor = kwargs.get('cursor')
+
+    query = database.session.query(User.id, User.email, User.disabled)
+    if cursor:
+        values = decode_cursor(cursor, size=2)
+        if values is None:
+            abort(HTTPStatus.EXPECTATION_FAILED, 'cursor is invalid')
+        try:
+            email, user_id = values[0], uuid.UUID(values[1])
+        except ValueError:
+            abort(HTTPStatus.EXPECTATION_FAILED, 'cursor is invalid')
+        query = query.filter(tuple_(User.email, User.id) > tuple_(email, user_id))
+
+    # keyset-пагинация по (email, id): в память попадает только одна страница
+    users = query.order_by(User.email, User.id).limit(per_page + 1).all()
+    if not users and not cursor:
         abort(HTTPStatus.NOT_FOUND, 'users not found')
 
-    return users
+    headers = {}
+    if len(users) > per_page:
+        users = users[:per_page]
+        headers['X-Next-Cursor'] = encode_cursor(users[-1].email, users[-1].id)
+
+    return users, headers
+
+
+@users_api_blueprint.route('/stream', methods=['GET'])
+@jwt_required()
+@rate_limit(by_email=True, by_ip=True)
+@check_access(USER_ALL.READ)
+def stream_all_users():
+    """Stream all users as NDJSON"""
+    query = (
+        database.session.query(User.id, User.email, User.disabled)
+        .order_by(User.email, User.id)
+        .execution_options(stream_results=True)
+        .yield_per(USERS_STREAM_CHUNK_SIZE)
+    )
+
+    # серверный курсор: память воркера не зависит от размера таблицы, первая строка уходит сразу
+    def generate():
+        for user in query:
+            yield json.dumps(user_schema.dump(user)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 @users_api_blueprint.route('/<user_id>', methods=['GET'])
@@ -161,14 +216,14 @@ def get_user_role(user_id: str):
     if not role_id:
         abort(HTTPStatus.NOT_FOUND, f'user with id={user_id} has no any role')
 
-    role_permissions = RolePermission.query.filter_by(role_id=role_id)
-    if not role_permissions:
-        abort(HTTPStatus.NOT_FOUND, f'role with id={role_id} have no any permissions')
+    role = role_cache.get(role_id)
+    if not role:
+        abort(HTTPStatus.NOT_FOUND, f'role with id={role_id} not found')
 
-    permissions_list = [Permission.query.get(role_permission.permission_id) for role_permission in role_permissions]
-    role = Role.query.get(role_id)
+    if not role['permissions']:
+        abort(HTTPStatus.NOT_FOUND, f'role with id={role_id} have no any permissions')
 
-    return dict(name=role.name, permissions=permissions_list)
+    return role
 
 
 @users_api_blueprint.route('/<user_id>/role/<role_id>', methods=['PUT'])
@@ -192,6 +247,7 @@ def set_user_role(user_id: str, role_id: str):
 
     user.role_id = role_id
     database.session.commit()
+    user_state_cache.invalidate(user.email)
 
     return user
 
@@ -204,14 +260,42 @@ def set_user_role(user_id: str, role_id: str):
 @check_access([USER_SELF.READ, USER_ALL.READ])
 def get_user_session_history(kwargs, user_id: str):
     """Get user's history"""
-    page = kwargs['page'] if kwargs else 1
-    per_page = kwargs['per_page'] if kwargs else 10
-
-    user_history: UserHistory = UserHistory.query.filter_by(user_id=user_id).paginate(page, per_page, error_out=False)
-    if not user_history.items:
+    per_page = kwargs.get('per_page', 10) if kwargs else 10
+    cursor = kwargs.get('cursor') if kwargs else None
+
+    query = UserHistory.query.filter_by(user_id=user_id)
+    if cursor:
+        values = decode_cursor(cursor, size=2)
+        if values is None:
+            abort(HTTPStatus.EXPECTATION_FAILED, 'cursor is invalid')
+        try:
+            created, history_id = datetime.fromisoformat(values[0]), uuid.UUID(values[1])
+        except ValueError:
+            abort(HTTPStatus.EXPECTATION_FAILED, 'cursor is invalid')
+        query = query.filter(tuple_(UserHistory.created, UserHistory.id) < tuple_(created, history_id))
+
+    # keyset-пагинация по индексу (user_id, created DESC, id DESC): глубокие страницы не дороже первой
+    items = query.order_by(UserHistory.created.desc(), UserHistory.id.desc()).limit(per_page + 1).all()
+    if not items and not cursor:
         abort(HTTPStatus.NOT_FOUND, f'user with user_id={user_id} has no history yet!')
 
-    return dict(history=user_history.items, page=page, per_page=per_page)
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1].created.isoformat(), items[-1].id)
+
+    return dict(history=items, per_page=per_page, next_cursor=next_cursor)
+
+
+@users_api_blueprint.route('/check_access/batch', methods=['POST'])
+@jwt_required()
+@rate_limit(limit=settings.TOKEN_INTROSPECTION_RATE_LIMIT, by_email=True, by_ip=True)
+@body(token_batch_schema)
+@response(token_batch_verdict_schema, HTTPStatus.OK)
+@check_access(USER_ALL.READ)
+def check_access_batch(kwargs):
+    """Validate a batch of tokens, verdicts are returned in the order of the tokens"""
+    return dict(results=introspect_tokens(kwargs['tokens']))
 
 
 @users_api_blueprint.route('/check_access', methods=['GET'])
@@ -220,13 +304,10 @@ def get_user_session_history(kwargs, user_id: str):
 @response(message_schema, HTTPStatus.OK)
 def check_access():
     """validate token"""
+    # отозванные токены отсекает jwt_required через token_in_blocklist_loader
     jwt = get_jwt()
-    jti = jwt['jti']
-    if jwt_redis_blocklist.get(jti):
-        abort(HTTPStatus.NOT_FOUND, 'token is revoked')
-
     email = jwt['sub']
-    user = User.query.filter_by(email=email).first()
+    user = user_state_cache.get(email, user_id=jwt.get('user_id'))
     if not user:
         abort(HTTPStatus.NOT_FOUND, 'user not found')
 
@@ -0,0 +1,9 @@
+"""
+The 'well_known' blueprint publishes discovery documents under /.well-known.
+Specifically, the JSON Web Key Set for verifying tokens outside of the auth service.
+"""
+from flask import Blueprint
+
+well_known_blueprint = Blueprint('well_known', __name__)
+
+from . import routes
@@ -0,0 +1,15 @@
+from flask import Response, request
+
+from project import settings
+from project.services.signing_keys import signing_keys
+from . import well_known_blueprint
+
+
+@well_known_blueprint.route('/jwks.json', methods=['GET'])
+def jwks():
+    """Public keys for local verification of access tokens (empty for HS256)"""
+    response = Response(signing_keys.jwks(), content_type='application/json')
+    response.cache_control.public = True
+    response.cache_control.max_age = settings.JWKS_MAX_AGE_SECONDS
+    response.add_etag()
+    return response.make_conditional(request)
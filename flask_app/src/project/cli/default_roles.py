@@ -1,52 +1,87 @@
+import typing as t
+import uuid
+
 from flask.cli import AppGroup
+from sqlalchemy import literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
 
 from project import database
 from project.core.permissions import DEFAULT_PERMISSIONS
 from project.core.roles import DEFAULT_ROLES
 from project.models.models import Role, Permission, RolePermission
+from project.services.permission_matrix import permission_matrix
 
 roles_cli = AppGroup('roles')
 
+# ключ pg_advisory_xact_lock: параллельно стартующие контейнеры заполняют роли по очереди
+ROLES_SEED_LOCK_ID = 1_070_005
+
+
+class SeedResult(t.NamedTuple):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
 
 @roles_cli.command('create')
 def create_default():
-    create_permissions()
-    create_empty_roles()
-    fill_roles()
-
-
-def create_permissions():
-    for key, value in DEFAULT_PERMISSIONS.items():
-        for permit in value:
-            try:
-                permission_item = Permission(name=permit.value)
-                database.session.add(permission_item)
-                database.session.commit()
-            except Exception:
-                pass
-
-
-def create_empty_roles():
-    for key, value in DEFAULT_ROLES.items():
-        try:
-            role_item = Role(name=key)
-            database.session.add(role_item)
-            database.session.commit()
-        except Exception:
-            pass
-
-
-def fill_roles():
-    for role_key, role_value in DEFAULT_ROLES.items():
-        role = database.session.query(Role).filter(Role.name == role_key).first()
-        for permission_key, permission_value in role_value.items():
-            try:
-                permission = database.session.query(Permission).filter(Permission.name == permission_key.value).first()
-                print(permission.name)
-                assoc = RolePermission(role_id=role.id, permission_id=permission.id, value=permission_value)
-                print(assoc)
-                database.session.add(assoc)
-            except Exception:
-                pass
-
-    database.session.commit()
+    # одна транзакция: при ошибке не остается частично заполненных ролей, повторный запуск ничего не меняет
+    with database.engine.begin() as connection:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': ROLES_SEED_LOCK_ID})
+        permission_ids, permissions_result = create_permissions(connection)
+        role_ids, roles_result = create_empty_roles(connection)
+        role_permissions_result = fill_roles(connection, role_ids, permission_ids)
+
+    for name, result in (('permissions', permissions_result),
+                         ('roles', roles_result),
+                         ('role permissions', role_permissions_result)):
+        print(f'{name}: inserted {result.inserted}, updated {result.updated}, unchanged {result.unchanged}')
+
+    if any(result.inserted or result.updated
+           for result in (permissions_result, roles_result, role_permissions_result)):
+        permission_matrix.invalidate()
+
+
+def _insert_names(connection, table, names: t.List[str]) -> t.Tuple[t.Dict[str, uuid.UUID], SeedResult]:
+    statement = (
+        insert(table)
+        .values([dict(id=uuid.uuid4(), name=name) for name in names])
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(table.c.id)
+    )
+    inserted = len(connection.execute(statement).fetchall())
+    ids = dict(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).fetchall())
+
+    return ids, SeedResult(inserted=inserted, unchanged=len(names) - inserted)
+
+
+def create_permissions(connection) -> t.Tuple[t.Dict[str, uuid.UUID], SeedResult]:
+    names = [permit.value for value in DEFAULT_PERMISSIONS.values() for permit in value]
+    return _insert_names(connection, Permission.__table__, names)
+
+
+def create_empty_roles(connection) -> t.Tuple[t.Dict[str, uuid.UUID], SeedResult]:
+    return _insert_names(connection, Role.__table__, list(DEFAULT_ROLES))
+
+
+def fill_roles(connection, role_ids: t.Dict[str, uuid.UUID], permission_ids: t.Dict[str, uuid.UUID]) -> SeedResult:
+    table = RolePermission.__table__
+    rows = [
+        dict(id=uuid.uuid4(),
+             role_id=role_ids[role_key],
+             permission_id=permission_ids[permission_key.value],
+             value=str(permission_value).lower())
+        for role_key, role_value in DEFAULT_ROLES.items()
+        for permission_key, permission_value in role_value.items()
+    ]
+    statement = insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        constraint='uq_role_permission_role_id_permission_id',
+        set_=dict(value=statement.excluded.value),
+        where=table.c.value.is_distinct_from(statement.excluded.value),
+    ).returning(literal_column('xmax = 0'))
+    # строки без изменений upsert не возвращает, у вставленных xmax = 0
+    changed = [inserted for inserted, in connection.execute(statement)]
+    inserted = sum(changed)
+
+    return SeedResult(inserted=inserted, updated=len(changed) - inserted, unchanged=len(rows) - len(changed))
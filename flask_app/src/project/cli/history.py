@@ -0,0 +1,29 @@
+import click
+from flask.cli import AppGroup
+
+from project import database, settings
+from project.services.history_partitions import drop_expired_partitions, ensure_partitions, partition_sizes
+
+history_cli = AppGroup('history')
+
+
+@history_cli.command('partitions')
+@click.option('--ahead', type=int, default=settings.HISTORY_PARTITIONS_AHEAD_MONTHS, show_default=True,
+              help='How many months of partitions to create in advance')
+@click.option('--retention', type=int, default=settings.HISTORY_RETENTION_MONTHS, show_default=True,
+              help='How many full months of history to keep besides the current one')
+def manage_partitions(ahead: int, retention: int):
+    with database.engine.begin() as connection:
+        created = ensure_partitions(connection, months_ahead=ahead)
+        dropped = drop_expired_partitions(connection, retention_months=retention)
+
+    for name in created:
+        print(f'created {name}')
+    for name in dropped:
+        print(f'dropped {name}')
+
+    with database.engine.connect() as connection:
+        sizes = partition_sizes(connection)
+    for name, rows, size in sizes:
+        print(f'{name:<40} {rows:>12} rows {size / 1024 / 1024:>10.1f} MB')
+    print(f'{"total":<40} {sum(r for _, r, _ in sizes):>12} rows {sum(s for _, _, s in sizes) / 1024 / 1024:>10.1f} MB')
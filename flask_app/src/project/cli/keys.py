@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from project import settings
+from project.services.signing_keys import ASYMMETRIC_ALGORITHMS, KEY_FILE_SUFFIX, SigningKeys, generate_key
+
+keys_cli = AppGroup('keys')
+
+
+def _load_keys(algorithm: str) -> SigningKeys:
+    keys = SigningKeys(
+        algorithm=algorithm,
+        keys_dir=settings.JWT_KEYS_DIR,
+        activation_delay=settings.JWT_KEY_ACTIVATION_SECONDS,
+        reload_interval=settings.JWT_KEYS_RELOAD_SECONDS,
+    )
+    keys.load()
+    return keys
+
+
+def _default_algorithm() -> str:
+    return settings.JWT_ALGORITHM if settings.JWT_ALGORITHM in ASYMMETRIC_ALGORITHMS else 'RS256'
+
+
+def _token_lifetime():
+    return max(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'], current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+
+
+@keys_cli.command('generate')
+@click.option('--algorithm', type=click.Choice(ASYMMETRIC_ALGORITHMS), default=_default_algorithm)
+@click.option('--bits', default=2048, show_default=True, help='RSA key size')
+def generate(algorithm: str, bits: int):
+    """Create a new signing key; it is published in JWKS at once and signs after the activation delay"""
+    kid = generate_key(settings.JWT_KEYS_DIR, algorithm, rsa_bits=bits)
+    print(f'created {algorithm} key {kid} in {settings.JWT_KEYS_DIR}')
+    print(f'workers pick it up within {settings.JWT_KEYS_RELOAD_SECONDS} s, it starts signing tokens '
+          f'{settings.JWT_KEY_ACTIVATION_SECONDS} s after creation (at once if there is no older key)')
+
+
+@keys_cli.command('list')
+@click.option('--algorithm', type=click.Choice(ASYMMETRIC_ALGORITHMS), default=_default_algorithm)
+def list_keys(algorithm: str):
+    """Show signing keys and their state"""
+    keys = _load_keys(algorithm)
+    active = keys.active()
+    retired = {key.kid for key in keys.retired(_token_lifetime())}
+    for key in keys.keys:
+        if key.kid == active.kid:
+            state = 'active'
+        elif key.kid in retired:
+            state = 'retired'
+        elif key.created > active.created:
+            state = 'pending'
+        else:
+            state = 'verify-only'
+        created = datetime.fromtimestamp(key.created, timezone.utc).isoformat(timespec='seconds')
+        print(f'{key.kid:<26} {created}  {state}')
+
+
+@keys_cli.command('prune')
+@click.option('--algorithm', type=click.Choice(ASYMMETRIC_ALGORITHMS), default=_default_algorithm)
+@click.option('--dry-run', is_flag=True, help='Only show keys that would be deleted')
+def prune(algorithm: str, dry_run: bool):
+    """Delete keys that stopped signing longer ago than the longest token lifetime"""
+    keys = _load_keys(algorithm)
+    for key in keys.retired(_token_lifetime()):
+        if not dry_run:
+            os.remove(os.path.join(settings.JWT_KEYS_DIR, f'{key.kid}{KEY_FILE_SUFFIX}'))
+        print(f'{"would delete" if dry_run else "deleted"} {key.kid}')
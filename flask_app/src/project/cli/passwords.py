@@ -0,0 +1,91 @@
+import os
+import statistics
+import time
+import typing as t
+
+import click
+from flask.cli import AppGroup
+
+from project import settings
+from project.services.password_schemes import (
+    Argon2Scheme,
+    PasswordScheme,
+    Pbkdf2Scheme,
+    ScryptScheme,
+    password_schemes,
+)
+
+passwords_cli = AppGroup('passwords')
+
+PBKDF2_PROBE_ITERATIONS = 100000
+SCRYPT_MIN_N = 2 ** 14
+SCRYPT_MAX_N = 2 ** 20
+ARGON2_MAX_TIME_COST = 10
+
+
+def _measure(scheme: PasswordScheme, samples: int) -> float:
+    """Медианное время одного хэша в секундах"""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        scheme.hash('calibration-password')
+        timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings)
+
+
+def _calibrate_pbkdf2(target: float, samples: int) -> t.Tuple[Pbkdf2Scheme, t.Dict[str, int]]:
+    # время PBKDF2 линейно по числу итераций: достаточно одной пробы
+    probe = _measure(Pbkdf2Scheme(PBKDF2_PROBE_ITERATIONS), samples)
+    iterations = max(1000, int(round(PBKDF2_PROBE_ITERATIONS * target / probe, -3)))
+    return Pbkdf2Scheme(iterations), dict(PASSWORD_PBKDF2_ITERATIONS=iterations)
+
+
+def _calibrate_scrypt(target: float, samples: int) -> t.Tuple[ScryptScheme, t.Dict[str, int]]:
+    # n - степень двойки: берется наибольшее n, укладывающееся в целевое время
+    r, p = settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+    n = SCRYPT_MIN_N
+    while n < SCRYPT_MAX_N and _measure(ScryptScheme(n * 2, r, p), samples) <= target:
+        n *= 2
+    return ScryptScheme(n, r, p), dict(PASSWORD_SCRYPT_N=n, PASSWORD_SCRYPT_R=r, PASSWORD_SCRYPT_P=p)
+
+
+def _calibrate_argon2(target: float, samples: int) -> t.Tuple[Argon2Scheme, t.Dict[str, int]]:
+    # память и параллелизм берутся из настроек, подбирается число проходов
+    memory_cost, parallelism = settings.PASSWORD_ARGON2_MEMORY_COST, settings.PASSWORD_ARGON2_PARALLELISM
+    time_cost = 1
+    while (time_cost < ARGON2_MAX_TIME_COST
+           and _measure(Argon2Scheme(time_cost + 1, memory_cost, parallelism), samples) <= target):
+        time_cost += 1
+    return Argon2Scheme(time_cost, memory_cost, parallelism), dict(
+        PASSWORD_ARGON2_TIME_COST=time_cost,
+        PASSWORD_ARGON2_MEMORY_COST=memory_cost,
+        PASSWORD_ARGON2_PARALLELISM=parallelism,
+    )
+
+
+CALIBRATORS = {
+    Pbkdf2Scheme.name: _calibrate_pbkdf2,
+    ScryptScheme.name: _calibrate_scrypt,
+    Argon2Scheme.name: _calibrate_argon2,
+}
+
+
+@passwords_cli.command('calibrate')
+@click.option('--scheme', 'scheme_name', type=click.Choice(list(password_schemes)),
+              default=settings.PASSWORD_HASH_SCHEME, show_default=True, help='Password hash scheme to calibrate')
+@click.option('--target-ms', type=float, default=250, show_default=True,
+              help='Target time of one hash on this host in milliseconds')
+@click.option('--samples', type=int, default=3, show_default=True, help='Hashes measured per candidate')
+def calibrate(scheme_name: str, target_ms: float, samples: int):
+    current = _measure(password_schemes[scheme_name], samples)
+    scheme, params = CALIBRATORS[scheme_name](target_ms / 1000, samples)
+    elapsed = _measure(scheme, samples)
+    workers = settings.PASSWORD_HASHER_WORKERS
+
+    print(f'current parameters: {current * 1000:.1f} ms per hash')
+    print(f'calibrated parameters: {elapsed * 1000:.1f} ms per hash, '
+          f'~{min(workers, os.cpu_count() or 1) / elapsed:.0f} logins/sec with {workers} hasher workers')
+    print(f'PASSWORD_HASH_SCHEME={scheme_name}')
+    for name, value in params.items():
+        print(f'{name}={value}')
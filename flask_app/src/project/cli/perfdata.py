@@ -0,0 +1,117 @@
+import csv
+import io
+import itertools
+import random
+import time
+import typing as t
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from project import database, settings
+from project.core.roles import DEFAULT_ROLES, ROLE_NON_REGISTERED, ROLE_SUPERUSER, ROLE_USER
+from project.services.history_partitions import HISTORY_PLATFORMS, ensure_partitions
+from project.services.password_hasher import password_hasher
+
+perfdata_cli = AppGroup('perfdata')
+
+COPY_CHUNK_ROWS = 100000
+
+ROLE_WEIGHTS = {ROLE_USER: 97, ROLE_NON_REGISTERED: 2, ROLE_SUPERUSER: 1}
+PLATFORM_WEIGHTS = {'windows': 35, 'android': 30, 'ios': 15, 'other': 10, 'linux': 5, 'macos': 3, 'unknown': 2}
+ACTIVITY_WEIGHTS = {'login': 50, 'logout': 40, 'login with google': 6, 'login with yandex': 4}
+
+
+def _uuid(rnd: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rnd.getrandbits(128), version=4)
+
+
+def _copy(cursor, table: str, columns: t.Sequence[str], rows: t.Iterable[tuple]) -> int:
+    """Пишет строки в таблицу через COPY порциями по COPY_CHUNK_ROWS строк"""
+    statement = f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    total = 0
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, COPY_CHUNK_ROWS)):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        total += len(chunk)
+
+    return total
+
+
+@perfdata_cli.command('generate')
+@click.option('--users', 'users_count', type=int, default=10000, show_default=True, help='Users to create')
+@click.option('--history', 'history_count', type=int, default=1000000, show_default=True,
+              help='User history rows to create')
+@click.option('--days', type=int, default=365, show_default=True, help='History time range ending now')
+@click.option('--seed', type=int, default=42, show_default=True, help='Random seed, same seed gives the same data')
+@click.option('--skew', type=float, default=1.2, show_default=True,
+              help='Pareto shape of events per user, smaller means a heavier tail of very active users')
+@click.option('--prefix', default='perf', show_default=True, help='Email prefix, change it to generate another batch')
+@click.option('--password', default='perfdata-password', show_default=True, help='Password of every generated user')
+def generate(users_count: int, history_count: int, days: int, seed: int, skew: float, prefix: str, password: str):
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+    # один хэш на всех пользователей: генерация не упирается в PBKDF2, а логин проверяет настоящий хэш
+    password_hashed = password_hasher.hash(password)
+
+    # помесячные партиции истории должны покрывать весь диапазон дат до COPY
+    with database.engine.begin() as partitions_connection:
+        ensure_partitions(partitions_connection, months_ahead=settings.HISTORY_PARTITIONS_AHEAD_MONTHS,
+                          since=since.date())
+
+    connection = database.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT name, id FROM roles WHERE name = ANY(%s)', (list(DEFAULT_ROLES),))
+        role_ids = dict(cursor.fetchall())
+        if len(role_ids) != len(DEFAULT_ROLES):
+            raise click.ClickException('default roles not found, run flask roles create first')
+
+        roles, role_weights = zip(*ROLE_WEIGHTS.items())
+        user_ids = [_uuid(rnd) for _ in range(users_count)]
+        started = time.perf_counter()
+        users_written = _copy(
+            cursor, 'users', ('id', 'created', 'modified', 'email', 'password_hashed', 'disabled', 'role_id'),
+            (
+                (user_id, since, since, f'{prefix}{index:08d}@perfdata.local', password_hashed,
+                 rnd.random() < 0.01, role_ids[rnd.choices(roles, role_weights)[0]])
+                for index, user_id in enumerate(user_ids)
+            ),
+        )
+        users_elapsed = time.perf_counter() - started
+
+        # активность пользователей распределена по Парето: немногие пользователи дают большую часть событий
+        user_weights = list(itertools.accumulate(rnd.paretovariate(skew) for _ in user_ids))
+        platforms, platform_weights = zip(*((p, PLATFORM_WEIGHTS.get(p, 1)) for p in HISTORY_PLATFORMS))
+        activities, activity_weights = zip(*ACTIVITY_WEIGHTS.items())
+        range_seconds = (now - since).total_seconds()
+        started = time.perf_counter()
+        history_written = _copy(
+            cursor, 'user_history', ('id', 'created', 'user_id', 'activity', 'platform'),
+            (
+                (_uuid(rnd), since + timedelta(seconds=rnd.random() * range_seconds),
+                 rnd.choices(user_ids, cum_weights=user_weights)[0],
+                 rnd.choices(activities, activity_weights)[0],
+                 rnd.choices(platforms, platform_weights)[0])
+                for _ in range(history_count)
+            ) if user_ids else (),
+        )
+        history_elapsed = time.perf_counter() - started
+
+        cursor.execute('ANALYZE users')
+        cursor.execute('ANALYZE user_history')
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    print(f'users: {users_written} rows in {users_elapsed:.1f}s')
+    print(f'user_history: {history_written} rows in {history_elapsed:.1f}s')
@@ -27,10 +27,98 @@ class Settings(BaseSettings):
     REDIS_HOST = Field(env='REDIS_HOST', default='127.0.0.1')
     REDIS_PORT = Field(env='REDIS_PORT', default=6379)
     REDIS_DB = Field(env='REDIS_DB', default=0)
+    # Путь к unix-сокету Redis, если задан - используется вместо host/port
+    REDIS_UNIX_SOCKET_PATH = Field(env='REDIS_UNIX_SOCKET_PATH', default='')
+    # Пул соединений общий для всего приложения, при исчерпании запрос ждет REDIS_POOL_TIMEOUT секунд
+    REDIS_MAX_CONNECTIONS = Field(env='REDIS_MAX_CONNECTIONS', default=50)
+    REDIS_POOL_TIMEOUT = Field(env='REDIS_POOL_TIMEOUT', default=5)
+    REDIS_SOCKET_TIMEOUT = Field(env='REDIS_SOCKET_TIMEOUT', default=5)
+    REDIS_SOCKET_CONNECT_TIMEOUT = Field(env='REDIS_SOCKET_CONNECT_TIMEOUT', default=2)
+    REDIS_HEALTH_CHECK_INTERVAL = Field(env='REDIS_HEALTH_CHECK_INTERVAL', default=30)
+
+    # Алгоритм rate limiter: sliding_log, sliding_window или gcra
+    RATE_LIMIT_ALGORITHM = Field(env='RATE_LIMIT_ALGORITHM', default='sliding_window')
+    # Локальные квоты воркеров: емкость ведра - доля воркера в лимите, умноженная на LOCAL_RATE_LIMIT_SLACK,
+    # пропущенные запросы и спрос на ключи синхронизируются с Redis раз в LOCAL_RATE_LIMIT_SYNC_SECONDS
+    LOCAL_RATE_LIMIT_ENABLED = Field(env='LOCAL_RATE_LIMIT_ENABLED', default=True)
+    LOCAL_RATE_LIMIT_SLACK = Field(env='LOCAL_RATE_LIMIT_SLACK', default=1.5)
+    LOCAL_RATE_LIMIT_SYNC_SECONDS = Field(env='LOCAL_RATE_LIMIT_SYNC_SECONDS', default=5)
+    LOCAL_RATE_LIMIT_MAX_KEYS = Field(env='LOCAL_RATE_LIMIT_MAX_KEYS', default=100000)
+
+    # Как часто воркер сверяет версию матрицы доступа с Redis
+    PERMISSIONS_VERSION_CHECK_SECONDS = Field(env='PERMISSIONS_VERSION_CHECK_SECONDS', default=5)
+
+    # Локальный фильтр Блума отозванных токенов (на одно поколение фильтра)
+    REVOCATION_FILTER_CAPACITY = Field(env='REVOCATION_FILTER_CAPACITY', default=100000)
+    REVOCATION_FILTER_ERROR_RATE = Field(env='REVOCATION_FILTER_ERROR_RATE', default=0.001)
+    REVOCATION_FILTER_SYNC_SECONDS = Field(env='REVOCATION_FILTER_SYNC_SECONDS', default=1)
+
+    # Отложенная запись истории входов: размер очереди, размер пачки и максимальная задержка записи
+    HISTORY_WRITE_BEHIND = Field(env='HISTORY_WRITE_BEHIND', default=True)
+    HISTORY_QUEUE_SIZE = Field(env='HISTORY_QUEUE_SIZE', default=10000)
+    HISTORY_BATCH_SIZE = Field(env='HISTORY_BATCH_SIZE', default=500)
+    HISTORY_FLUSH_SECONDS = Field(env='HISTORY_FLUSH_SECONDS', default=1)
+    # Повторы записи пачки истории при ошибке БД (задержка удваивается), затем запись по одной строке
+    HISTORY_FLUSH_RETRIES = Field(env='HISTORY_FLUSH_RETRIES', default=3)
+    HISTORY_FLUSH_BACKOFF_SECONDS = Field(env='HISTORY_FLUSH_BACKOFF_SECONDS', default=0.5)
+
+    # Помесячные партиции истории: сколько месяцев создавать заранее и сколько хранить
+    HISTORY_PARTITIONS_AHEAD_MONTHS = Field(env='HISTORY_PARTITIONS_AHEAD_MONTHS', default=3)
+    HISTORY_RETENTION_MONTHS = Field(env='HISTORY_RETENTION_MONTHS', default=12)
+
+    # Кэш состояния пользователей (id, role_id, disabled) для проверок доступа
+    USER_STATE_CACHE_TTL_SECONDS = Field(env='USER_STATE_CACHE_TTL_SECONDS', default=300)
+    USER_STATE_LOCAL_TTL_SECONDS = Field(env='USER_STATE_LOCAL_TTL_SECONDS', default=5)
+    USER_STATE_LOCAL_CACHE_SIZE = Field(env='USER_STATE_LOCAL_CACHE_SIZE', default=10000)
+    # Кэш ролей с пермишенами в Redis, ключи версионируются счетчиком матрицы доступа
+    ROLE_CACHE_TTL_SECONDS = Field(env='ROLE_CACHE_TTL_SECONDS', default=300)
+
+    # Эндпоинт /metrics и сбор метрик запросов и SQL
+    METRICS_ENABLED = Field(env='METRICS_ENABLED', default=True)
+    # Заголовки X-DB-Queries и X-Redis-Calls с числом обращений за запрос (для тестов бюджетов, не для продакшена)
+    REQUEST_COUNTERS_HEADERS = Field(env='REQUEST_COUNTERS_HEADERS', default=False)
+
+    # Хэширование паролей вне гевент-хаба: thread - нативные потоки, process - пул процессов, inline - в запросе
+    PASSWORD_HASHER_MODE = Field(env='PASSWORD_HASHER_MODE', default='thread')
+    PASSWORD_HASHER_WORKERS = Field(env='PASSWORD_HASHER_WORKERS', default=4)
+    # Схема хэширования паролей (pbkdf2, scrypt, argon2) и ее параметры, подбираются командой flask passwords calibrate.
+    # Хэши с устаревшими параметрами пересчитываются при логине
+    PASSWORD_HASH_SCHEME = Field(env='PASSWORD_HASH_SCHEME', default='pbkdf2')
+    PASSWORD_PBKDF2_ITERATIONS = Field(env='PASSWORD_PBKDF2_ITERATIONS', default=260000)
+    PASSWORD_SCRYPT_N = Field(env='PASSWORD_SCRYPT_N', default=32768)
+    PASSWORD_SCRYPT_R = Field(env='PASSWORD_SCRYPT_R', default=8)
+    PASSWORD_SCRYPT_P = Field(env='PASSWORD_SCRYPT_P', default=1)
+    PASSWORD_ARGON2_TIME_COST = Field(env='PASSWORD_ARGON2_TIME_COST', default=3)
+    PASSWORD_ARGON2_MEMORY_COST = Field(env='PASSWORD_ARGON2_MEMORY_COST', default=65536)
+    PASSWORD_ARGON2_PARALLELISM = Field(env='PASSWORD_ARGON2_PARALLELISM', default=4)
 
     ACCESS_EXPIRES_IN_HOURS = Field(env='ACCESS_EXPIRES_IN_HOURS', default=1)
     REFRESH_EXPIRES_IN_DAYS = Field(env='REFRESH_EXPIRES_IN_DAYS', default=1)
+    # Минимальный интервал между обновлениями токенов одной семьи refresh-токенов
+    REFRESH_MIN_INTERVAL_SECONDS = Field(env='REFRESH_MIN_INTERVAL_SECONDS', default=60)
+    # Окно после ротации, в которое повтор запроса с предыдущим refresh-токеном не считается повторным использованием
+    REFRESH_REUSE_GRACE_SECONDS = Field(env='REFRESH_REUSE_GRACE_SECONDS', default=10)
     SECRET_KEY = Field(env='JWT_SECRET_KEY', default='secret_key')
+    # Подпись JWT: HS256 (SECRET_KEY) или асимметричные RS256/EdDSA ключами из JWT_KEYS_DIR (flask keys generate).
+    # Новый ключ сразу попадает в /.well-known/jwks.json, а подписывать начинает через JWT_KEY_ACTIVATION_SECONDS,
+    # поэтому задержка должна быть больше JWKS_MAX_AGE_SECONDS
+    JWT_ALGORITHM = Field(env='JWT_ALGORITHM', default='HS256')
+    JWT_KEYS_DIR = Field(env='JWT_KEYS_DIR', default=os.path.join(os.path.dirname(BASE_DIR), 'jwt_keys'))
+    JWT_KEY_ACTIVATION_SECONDS = Field(env='JWT_KEY_ACTIVATION_SECONDS', default=900)
+    JWT_KEYS_RELOAD_SECONDS = Field(env='JWT_KEYS_RELOAD_SECONDS', default=10)
+    JWKS_MAX_AGE_SECONDS = Field(env='JWKS_MAX_AGE_SECONDS', default=300)
+    # Класть в access-токен битовую маску пермишенов роли (claims perms и perms_ver)
+    JWT_PERMISSIONS_BITMASK = Field(env='JWT_PERMISSIONS_BITMASK', default=False)
+
+    # Пакетная проверка токенов для шлюзов: максимум токенов в запросе и лимит запросов в минуту на клиента
+    TOKEN_INTROSPECTION_BATCH_SIZE = Field(env='TOKEN_INTROSPECTION_BATCH_SIZE', default=100)
+    TOKEN_INTROSPECTION_RATE_LIMIT = Field(env='TOKEN_INTROSPECTION_RATE_LIMIT', default=600)
+
+    # Максимальный размер страницы в списках с курсорной пагинацией
+    MAX_PER_PAGE = Field(env='MAX_PER_PAGE', default=100)
+
+    # Сколько секунд nginx может кэшировать положительный вердикт /auth/verify (не дольше срока жизни токена)
+    AUTH_VERIFY_CACHE_SECONDS = Field(env='AUTH_VERIFY_CACHE_SECONDS', default=30)
 
     TRACING_OFF = Field(env='TURN_OFF_TRACING', default=True)
     JAEGER_HOST = Field(env='JAEGER_HOST', default='127.0.0.1')
@@ -48,6 +136,7 @@ class Settings(BaseSettings):
     YANDEX_LOGIN_INFO_URL = Field(env='YANDEX_LOGIN_INFO_URL', default='https://login.yandex.ru/info')
 
     PLATFORMS_TUPLE = ('windows', 'linux', 'macos', 'ios', 'android')
+    USER_AGENT_CACHE_SIZE = Field(env='USER_AGENT_CACHE_SIZE', default=1024)
 
 
 settings = Settings()
@@ -0,0 +1,153 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Метрики пишутся в общий каталог при заданной PROMETHEUS_MULTIPROC_DIR (несколько воркеров),
+# поэтому у Gauge указан способ агрегации между процессами
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+# ----
+# HTTP
+# ----
+
+HTTP_REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by Flask endpoint',
+    ['endpoint', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+
+# --
+# БД
+# --
+
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'SQL statements executed, by statement type',
+    ['statement'],
+)
+DB_QUERY_ERRORS = Counter(
+    'db_query_errors_total',
+    'SQL statements that failed, by statement type',
+    ['statement'],
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds',
+    'SQL statement execution time',
+    ['statement'],
+    buckets=LATENCY_BUCKETS,
+)
+
+# -----
+# Redis
+# -----
+
+REDIS_COMMAND_LATENCY = Histogram(
+    'redis_command_duration_seconds',
+    'Redis command latency including waiting for a pooled connection',
+    ['command'],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_POOL_WAIT = Histogram(
+    'redis_pool_wait_seconds',
+    'Time spent acquiring a connection from the shared Redis pool',
+    buckets=LATENCY_BUCKETS,
+)
+
+# -------------------------
+# Фильтр отозванных токенов
+# -------------------------
+
+REVOCATION_FILTER_CHECKS = Counter(
+    'revocation_filter_checks_total',
+    'Token revocation checks answered by the local filter',
+)
+REVOCATION_FILTER_POSSIBLE_HITS = Counter(
+    'revocation_filter_possible_hits_total',
+    'Checks where the local filter reported a possible hit and Redis was consulted',
+)
+REVOCATION_FILTER_FALSE_POSITIVES = Counter(
+    'revocation_filter_false_positives_total',
+    'Possible hits that Redis did not confirm',
+)
+REVOCATION_FILTER_HITS = Counter(
+    'revocation_filter_revoked_total',
+    'Requests rejected because the token was revoked',
+)
+REVOCATION_FILTER_SYNC_LAG = Gauge(
+    'revocation_filter_sync_lag_seconds',
+    'Delay between a revocation being published and this worker applying it',
+    multiprocess_mode='max',
+)
+REVOCATION_FILTER_SIZE = Gauge(
+    'revocation_filter_items',
+    'Revoked token ids held by the local filter',
+    multiprocess_mode='max',
+)
+
+# --------------
+# Refresh-токены
+# --------------
+
+REFRESH_ROTATIONS = Counter(
+    'refresh_token_rotations_total',
+    'Refresh attempts by outcome: rotated, retried (previous token within the grace window), expired, reused '
+    '(family revoked) or throttled',
+    ['result'],
+)
+
+# ------------
+# Rate limiter
+# ------------
+
+RATE_LIMIT_REJECTIONS = Counter(
+    'rate_limit_rejections_total',
+    'Requests rejected by the rate limiter, by layer (local bucket or Redis) and key scope',
+    ['layer', 'scope'],
+)
+
+# ---------------------------------
+# Отложенная запись истории входов
+# ---------------------------------
+
+HISTORY_QUEUE_DEPTH = Gauge(
+    'user_history_queue_depth',
+    'User history rows waiting in the write-behind queue',
+    multiprocess_mode='livesum',
+)
+HISTORY_SYNC_FALLBACKS = Counter(
+    'user_history_sync_fallbacks_total',
+    'User history rows written synchronously because the queue was full',
+)
+HISTORY_FLUSHED_ROWS = Counter(
+    'user_history_flushed_rows_total',
+    'User history rows written by the background writer',
+)
+HISTORY_FLUSH_ERRORS = Counter(
+    'user_history_flush_errors_total',
+    'Failed user history write attempts, including retries and single-row fallbacks',
+)
+HISTORY_DROPPED_ROWS = Counter(
+    'user_history_dropped_rows_total',
+    'User history rows dropped because the database rejected them even when written one by one',
+)
+HISTORY_FLUSH_LATENCY = Histogram(
+    'user_history_flush_duration_seconds',
+    'Time to write one user history batch',
+    buckets=LATENCY_BUCKETS,
+)
+
+# ---------------------
+# Хэширование паролей
+# ---------------------
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'password_hash_in_flight',
+    'Password hash and verify calls submitted to the hashing pool and not yet finished',
+    multiprocess_mode='livesum',
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    'password_hash_duration_seconds',
+    'Password hash or verify latency including waiting for a pool worker',
+    ['operation'],
+    buckets=LATENCY_BUCKETS,
+)
@@ -52,3 +52,27 @@ DEFAULT_PERMISSIONS = {
     "role_all": ROLE_ALL,
     "permission": PERMISSION
 }
+
+# Позиция бита пермишена в маске токена: порядок групп в DEFAULT_PERMISSIONS и порядок объявления внутри группы.
+# Новые пермишены добавлять только в конец, иначе маски в уже выданных токенах будут прочитаны неверно.
+PERMISSION_BITS = {
+    permission.value: bit
+    for bit, permission in enumerate(
+        permission for group in DEFAULT_PERMISSIONS.values() for permission in group
+    )
+}
+
+
+def permissions_to_mask(permission_names) -> int:
+    """
+    Метод собирает битовую маску из имен пермишенов
+    @param permission_names: имена пермишенов (значения enum)
+    @return: битовая маска, неизвестные имена пропускаются
+    """
+    mask = 0
+    for name in permission_names:
+        bit = PERMISSION_BITS.get(name)
+        if bit is not None:
+            mask |= 1 << bit
+
+    return mask
@@ -1,56 +1,110 @@
 import typing as t
+from datetime import timedelta
 from http import HTTPStatus
 
-import redis
 from flask import abort
-from flask_jwt_extended import get_jwt
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt
 
-from project import database, jwt, settings
+from project import database, jwt, redis, settings
+from project.core.permissions import permissions_to_mask
 from project.models.models import (
     UserHistory,
-    RolePermission,
-    Permission,
     User,
 )
-
-jwt_redis_blocklist = redis.StrictRedis(
-    host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB, decode_responses=True
+from project.services.history_writer import history_writer
+from project.services.permission_matrix import permission_matrix
+from project.services.refresh_tokens import refresh_token_families
+from project.services.revocation_filter import RevocationFilter
+from project.services.user_cache import user_state_cache
+
+revocation_filter = RevocationFilter(
+    redis,
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=settings.REVOCATION_FILTER_SYNC_SECONDS,
+    retention=timedelta(settings.ACCESS_EXPIRES_IN_HOURS),
 )
 
 
 @jwt.token_in_blocklist_loader
 def check_if_token_is_revoked(jwt_header, jwt_payload: dict):
-    jti = jwt_payload["jti"]
-    token_in_redis = jwt_redis_blocklist.get(jti)
-    return token_in_redis is not None
+    return revocation_filter.is_revoked(jwt_payload["jti"])
 
 
 def log_activity(user_id: str, activity: str, platform: str = 'other'):
+    if settings.HISTORY_WRITE_BEHIND and history_writer.put(user_id=user_id, activity=activity, platform=platform):
+        return
+
     user_history = UserHistory(user_id=user_id, activity=activity, platform=platform)
     database.session.add(user_history)
     database.session.commit()
 
 
+def build_additional_claims(user: User) -> dict:
+    """
+    Метод собирает дополнительные claims access-токена пользователя
+    @param user: пользователь, на которого выпускается токен
+    @return: словарь claims
+    """
+    additional_claims = {'role_id': user.role_id, 'user_id': str(user.id)}
+    if settings.JWT_PERMISSIONS_BITMASK:
+        additional_claims['perms'] = permission_matrix.mask(user.role_id)
+        additional_claims['perms_ver'] = permission_matrix.version
+
+    return additional_claims
+
+
+def issue_tokens(identity: str, user, family: t.Optional[str] = None, refresh_jti: t.Optional[str] = None) -> dict:
+    """
+    Метод выпускает пару access и refresh-токенов
+    @param identity: email пользователя
+    @param user: пользователь или его кэшированное состояние (нужны id и role_id)
+    @param family: семья refresh-токенов, если не задана - создается новая (логин)
+    @param refresh_jti: jti нового refresh-токена семьи, полученный при ротации
+    @return: словарь для token_schema
+    """
+    if family is None:
+        family, refresh_jti = refresh_token_families.start()
+
+    # семья в access-токене нужна, чтобы логаут отзывал и refresh-токены сессии
+    additional_claims = {**build_additional_claims(user), 'family': family}
+    refresh_claims = {'user_id': str(user.id), 'family': family, 'jti': refresh_jti}
+    return dict(
+        token=create_access_token(identity=identity, additional_claims=additional_claims),
+        refresh_token=create_refresh_token(identity=identity, additional_claims=refresh_claims),
+    )
+
+
 def check_access(permission: t.Union[t.Any, t.List[t.Any]]):
     """
     Декоратор для проверки уровня доступа текущего пользователя.
     :param permission: объект пермишена
     """
 
+    permission_list = [permission] if not isinstance(permission, list) else permission
+    permission_names = [p.value for p in permission_list]
+    required_mask = permissions_to_mask(permission_names)
+
     def decorator(func):
         def wrapper(*args, **kwargs):
-            email = get_jwt()['sub']
-            user = User.query.filter_by(email=email).first()
+            claims = get_jwt()
+            email = claims['sub']
+            user = user_state_cache.get(email, user_id=claims.get('user_id'))
             if not user:
                 abort(HTTPStatus.NOT_FOUND, f'user with email={email} not found')
             role_id = user.role_id
             if not role_id:
                 abort(HTTPStatus.FORBIDDEN, f'user with id={user.id} has no access for action')
 
-            permission_list = [permission] if not isinstance(permission, list) else permission
+            # маска из токена актуальна, пока не изменились версия матрицы доступа и роль пользователя:
+            # после смены роли старый токен проверяется по текущей роли
+            if ('perms' in claims and claims.get('perms_ver') == permission_matrix.version
+                    and claims.get('role_id') == role_id):
+                if not claims['perms'] & required_mask:
+                    abort(HTTPStatus.FORBIDDEN, 'user has no access for action')
+                return func(*args, **kwargs)
 
-            access = any([_check_permission(role_id, p) for p in permission_list])
-            if not access:
+            if not permission_matrix.has_any(role_id, permission_names):
                 abort(HTTPStatus.FORBIDDEN, f'user with id={user.id} has no access for action')
 
             return func(*args, **kwargs)
@@ -61,14 +115,3 @@ def check_access(permission: t.Union[t.Any, t.List[t.Any]]):
 
     return decorator
 
-
-def _check_permission(role_id, permission) -> bool:
-    permission_obj = Permission.query.filter_by(name=permission.value).first()
-    if not permission_obj:
-        return False
-
-    role_permission = RolePermission.query.filter_by(role_id=role_id, permission_id=permission_obj.id).first()
-    if not role_permission:
-        return False
-
-    return role_permission.value.lower() == 'true'
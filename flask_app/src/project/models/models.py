@@ -4,13 +4,13 @@ from datetime import datetime, timedelta
 from http import HTTPStatus
 
 from flask import abort
-from sqlalchemy import UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.sql import func
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from project import database, settings
 from project.core.roles import USER_DEFAULT_ROLE
+from project.services.password_hasher import password_hasher
 
 
 # ----------------
@@ -46,7 +46,7 @@ class User(IDMixin, CreatedModifiedMixin, database.Model):
                             unique=True,
                             nullable=False)
 
-    password_hashed = database.Column(database.String(128),
+    password_hashed = database.Column(database.String(255),
                                       nullable=False)
 
     auth_token = database.Column(database.String(64),
@@ -74,7 +74,10 @@ class User(IDMixin, CreatedModifiedMixin, database.Model):
             self.role_id = role_id
 
     def is_password_correct(self, password_plaintext: str):
-        return check_password_hash(self.password_hashed, password_plaintext)
+        return password_hasher.verify(self.password_hashed, password_plaintext)
+
+    def password_needs_rehash(self) -> bool:
+        return password_hasher.needs_rehash(self.password_hashed)
 
     def set_password(self, password_plaintext: str):
         self.password_hashed = self._generate_password_hash(password_plaintext)
@@ -87,7 +90,7 @@ class User(IDMixin, CreatedModifiedMixin, database.Model):
 
     @staticmethod
     def _generate_password_hash(password_plaintext):
-        return generate_password_hash(password_plaintext)
+        return password_hasher.hash(password_plaintext)
 
     def generate_auth_token(self):
         self.auth_token = secrets.token_urlsafe()
@@ -114,6 +117,11 @@ class Role(IDMixin, CreatedModifiedMixin, database.Model):
                            unique=True,
                            nullable=False)
 
+    role_permissions = database.relationship('RolePermission',
+                                             back_populates='role',
+                                             cascade='all, delete-orphan',
+                                             lazy='selectin')
+
     def __init__(self, name: str):
         """Create a new Role object."""
         self.name = name
@@ -139,6 +147,9 @@ class Permission(IDMixin, database.Model):
 
 class RolePermission(IDMixin, CreatedMixin, database.Model):
     __tablename__ = 'role_permission'
+    __table_args__ = (
+        UniqueConstraint('role_id', 'permission_id', name='uq_role_permission_role_id_permission_id'),
+    )
 
     role_id = database.Column(UUID(as_uuid=True),
                               database.ForeignKey('roles.id'),
@@ -151,6 +162,10 @@ class RolePermission(IDMixin, CreatedMixin, database.Model):
     value = database.Column(database.String,
                             nullable=False)
 
+    role = database.relationship('Role', back_populates='role_permissions')
+
+    permission = database.relationship('Permission', lazy='joined')
+
     def __init__(self, role_id: str, permission_id: str, value: str):
         """Create a new RolePermission object."""
         self.role_id = role_id
@@ -159,14 +174,35 @@ class RolePermission(IDMixin, CreatedMixin, database.Model):
 
     @staticmethod
     def set_permissions_to_role(role_id: str, permission_list: list):
+        """
+        Метод выдает роли пермишены: все id проверяются одним запросом, строки пишутся одним upsert,
+        уже выданный роли пермишен получает новое значение вместо дублирующей строки
+        @param role_id: идентификатор роли
+        @param permission_list: список dict(id, value)
+        """
+        values = {}
         for permission_dict in permission_list:
             permission_id = permission_dict['id']
-            permission_value = permission_dict.get('value', 'true')
-            permission = Permission.query.get(permission_id)
-            if not permission:
+            try:
+                values[uuid.UUID(str(permission_id))] = permission_dict.get('value', 'true')
+            except ValueError:
+                abort(HTTPStatus.NOT_FOUND, f'permission with id={permission_id} not found')
+        if not values:
+            return
+
+        found = {row.id for row in Permission.query.with_entities(Permission.id).filter(Permission.id.in_(values))}
+        for permission_id in values:
+            if permission_id not in found:
                 abort(HTTPStatus.NOT_FOUND, f'permission with id={permission_id} not found')
-            role_permission = RolePermission(role_id=role_id, permission_id=permission_id, value=permission_value)
-            database.session.add(role_permission)
+
+        statement = insert(RolePermission.__table__).values([
+            dict(id=uuid.uuid4(), role_id=role_id, permission_id=permission_id, value=value)
+            for permission_id, value in values.items()
+        ])
+        database.session.execute(statement.on_conflict_do_update(
+            constraint='uq_role_permission_role_id_permission_id',
+            set_=dict(value=statement.excluded.value),
+        ))
 
     def __repr__(self):
         return f'<RolePermission {self.id}>'
@@ -174,29 +210,34 @@ class RolePermission(IDMixin, CreatedMixin, database.Model):
 
 def create_partition(target, connection, **kw) -> None:
     """ creating partition by user_history """
-    connection.execute(
-        """CREATE TABLE IF NOT EXISTS "user_history_unknown" PARTITION OF "user_history" FOR VALUES IN ('unknown')"""
-    )
-    for platform in settings.PLATFORMS_TUPLE:
-        connection.execute(
-            f"""CREATE TABLE IF NOT EXISTS "user_history_{platform}" PARTITION OF "user_history" FOR VALUES IN ('{platform}')"""  # noqa E501
-        )
+    from project.services.history_partitions import ensure_partitions
 
+    ensure_partitions(connection, months_ahead=settings.HISTORY_PARTITIONS_AHEAD_MONTHS)
 
-class UserHistory(IDMixin, CreatedMixin, database.Model):
+
+class UserHistory(database.Model):
     __tablename__ = 'user_history'
+    # партиции: LIST по платформе, внутри - помесячные RANGE по created,
+    # поэтому оба ключа партицирования входят в первичный ключ
     __table_args__ = (
-        UniqueConstraint('id', 'platform'),
+        PrimaryKeyConstraint('id', 'platform', 'created'),
         {
             'postgresql_partition_by': 'LIST (platform)',
             'listeners': [('after_create', create_partition)],
         }
     )
 
+    id = database.Column(UUID(as_uuid=True),
+                         default=uuid.uuid4,
+                         nullable=False)
+
+    created = database.Column(database.DateTime,
+                              default=func.now(),
+                              nullable=False)
+
     user_id = database.Column(UUID(as_uuid=True),
                               database.ForeignKey('users.id', ondelete='CASCADE'),
-                              nullable=False,
-                              index=True)
+                              nullable=False)
 
     activity = database.Column(database.String,
                                unique=False,
@@ -214,3 +255,8 @@ class UserHistory(IDMixin, CreatedMixin, database.Model):
 
     def __repr__(self):
         return f'<UserHistory {self.id}>'
+
+
+# индекс под keyset-пагинацию истории пользователя, создается на каждой партиции
+database.Index('ix_user_history_user_id_created_id',
+               UserHistory.user_id, UserHistory.created.desc(), UserHistory.id.desc())
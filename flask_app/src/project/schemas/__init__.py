@@ -6,7 +6,7 @@ from project.schemas.role import (
     PermissionSchema,
 )
 from project.schemas.session import HistorySchema, LoginSchema, PaginatedHistorySchema
-from project.schemas.token import TokenSchema
+from project.schemas.token import TokenBatchSchema, TokenBatchVerdictSchema, TokenSchema
 from project.schemas.user import (
     NewUserSchema,
     UserSchema,
@@ -20,6 +20,8 @@ user_schema = UserSchema()
 user_role_schema = UserRole()
 
 token_schema = TokenSchema()
+token_batch_schema = TokenBatchSchema()
+token_batch_verdict_schema = TokenBatchVerdictSchema()
 
 login_schema = LoginSchema()
 
@@ -1,6 +1,8 @@
-from project import ma
+from marshmallow import validate
+
+from project import ma, settings
 
 
 class PaginationSchema(ma.Schema):
-    page = ma.Integer(default=1)
-    per_page = ma.Integer(default=10)
+    per_page = ma.Integer(default=10, validate=validate.Range(min=1, max=settings.MAX_PER_PAGE))
+    cursor = ma.String()
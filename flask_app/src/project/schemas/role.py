@@ -8,6 +8,7 @@ class PermissionSchema(ma.Schema):
 
 class NestedPermissionSchema(ma.Schema):
     id = ma.String()
+    name = ma.String(dump_only=True)
     value = ma.String()
 
 
@@ -1,4 +1,6 @@
-from project import ma
+from marshmallow import validate
+
+from project import ma, settings
 
 
 class HistorySchema(ma.Schema):
@@ -8,8 +10,8 @@ class HistorySchema(ma.Schema):
 
 class PaginatedHistorySchema(ma.Schema):
     history = ma.List(ma.Nested(HistorySchema))
-    page = ma.Integer(default=1)
-    per_page = ma.Integer(default=10)
+    per_page = ma.Integer(default=10, validate=validate.Range(min=1, max=settings.MAX_PER_PAGE))
+    next_cursor = ma.String()
 
 
 class LoginSchema(ma.Schema):
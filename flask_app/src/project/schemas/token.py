@@ -1,6 +1,30 @@
-from project import ma
+from marshmallow import validate
+
+from project import ma, settings
 
 
 class TokenSchema(ma.Schema):
     """Schema defining the attributes of a token."""
     token = ma.String()
+    refresh_token = ma.String()
+
+
+class TokenBatchSchema(ma.Schema):
+    """Schema defining the tokens to introspect in one request."""
+    tokens = ma.List(ma.String(), required=True,
+                     validate=validate.Length(min=1, max=settings.TOKEN_INTROSPECTION_BATCH_SIZE))
+
+
+class TokenVerdictSchema(ma.Schema):
+    """Schema defining the verdict for one token."""
+    valid = ma.Boolean()
+    reason = ma.String()
+    user_id = ma.String()
+    role_id = ma.String()
+    permissions = ma.List(ma.String())
+    expires = ma.Integer()
+
+
+class TokenBatchVerdictSchema(ma.Schema):
+    """Schema defining the verdicts in the order of the requested tokens."""
+    results = ma.List(ma.Nested(TokenVerdictSchema))
@@ -0,0 +1,177 @@
+import typing as t
+from datetime import date
+
+from sqlalchemy import text
+
+from project import settings
+
+HISTORY_TABLE = 'user_history'
+HISTORY_PLATFORMS = ('unknown', 'other') + settings.PLATFORMS_TUPLE
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def platform_partition_name(platform: str) -> str:
+    return f'{HISTORY_TABLE}_{platform}'
+
+
+def month_partition_name(platform: str, month: date) -> str:
+    return f'{HISTORY_TABLE}_{platform}_{month:%Y_%m}'
+
+
+def _month_from_partition_name(name: str) -> t.Optional[date]:
+    year, _, month = name[-7:].partition('_')
+    if not (len(year) == 4 and year.isdigit() and len(month) == 2 and month.isdigit()):
+        return None
+
+    return date(int(year), int(month), 1)
+
+
+def _children(connection, parent: str) -> t.List[str]:
+    rows = connection.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+            """
+        ),
+        {'parent': parent},
+    )
+    return [row[0] for row in rows]
+
+
+def _create_month_partition(connection, platform: str, month: date) -> None:
+    """
+    Метод создает помесячную партицию платформы.
+    Postgres не создает партицию, пока строки ее диапазона лежат в DEFAULT (команда не запускалась до начала месяца),
+    поэтому такие строки переносятся в отдельную таблицу, которая затем присоединяется как партиция
+    """
+    platform_table = platform_partition_name(platform)
+    default_table = f'{platform_table}_default'
+    month_table = month_partition_name(platform, month)
+    bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+    month_range = {'start': month, 'end': add_months(month, 1)}
+
+    in_default = connection.execute(
+        text(f'SELECT EXISTS (SELECT 1 FROM "{default_table}" WHERE created >= :start AND created < :end)'),
+        month_range,
+    ).scalar()
+    if not in_default:
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{month_table}" PARTITION OF "{platform_table}" FOR VALUES {bounds}'
+        )
+        return
+
+    # индексы и ограничения родителя создаются на таблице при ATTACH
+    connection.execute(f'CREATE TABLE "{month_table}" (LIKE "{platform_table}" INCLUDING DEFAULTS)')
+    connection.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM "{default_table}" WHERE created >= :start AND created < :end RETURNING *
+            )
+            INSERT INTO "{month_table}" SELECT * FROM moved
+            """
+        ),
+        month_range,
+    )
+    connection.execute(f'ALTER TABLE "{platform_table}" ATTACH PARTITION "{month_table}" FOR VALUES {bounds}')
+
+
+def ensure_partitions(connection, months_ahead: int, today: t.Optional[date] = None,
+                      since: t.Optional[date] = None) -> t.List[str]:
+    """
+    Метод создает недостающие партиции истории: по платформе (LIST), внутри нее помесячно по created (RANGE)
+    с текущего месяца на months_ahead месяцев вперед и партицию DEFAULT для всего, что вне диапазона
+    @param connection: соединение SQLAlchemy
+    @param months_ahead: на сколько месяцев вперед создавать партиции
+    @param today: текущая дата (для тестов)
+    @param since: создать помесячные партиции начиная с этой даты, а не с текущего месяца
+    @return: имена созданных партиций
+    """
+    current_month = month_start(today or date.today())
+    first_month = month_start(since) if since and since < current_month else current_month
+    created = []
+    platform_tables = set(_children(connection, HISTORY_TABLE))
+    for platform in HISTORY_PLATFORMS:
+        platform_table = platform_partition_name(platform)
+        if platform_table not in platform_tables:
+            connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS "{platform_table}" PARTITION OF "{HISTORY_TABLE}" FOR VALUES IN ('{platform}') PARTITION BY RANGE (created)"""  # noqa E501
+            )
+            connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS "{platform_table}_default" PARTITION OF "{platform_table}" DEFAULT"""
+            )
+            created.extend((platform_table, f'{platform_table}_default'))
+
+        existing = set(_children(connection, platform_table))
+        month = first_month
+        while month <= add_months(current_month, months_ahead):
+            month_table = month_partition_name(platform, month)
+            if month_table not in existing:
+                _create_month_partition(connection, platform, month)
+                created.append(month_table)
+            month = add_months(month, 1)
+
+    return created
+
+
+def drop_expired_partitions(connection, retention_months: int, today: t.Optional[date] = None) -> t.List[str]:
+    """
+    Метод отсоединяет и удаляет помесячные партиции старше срока хранения
+    и удаляет строки старше срока хранения из партиций DEFAULT
+    @param connection: соединение SQLAlchemy
+    @param retention_months: сколько полных месяцев истории хранить кроме текущего
+    @param today: текущая дата (для тестов)
+    @return: имена удаленных партиций и очищенных партиций DEFAULT с числом удаленных строк
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    dropped = []
+    for platform in HISTORY_PLATFORMS:
+        platform_table = platform_partition_name(platform)
+        default_table = f'{platform_table}_default'
+        deleted = connection.execute(
+            text(f'DELETE FROM "{default_table}" WHERE created < :cutoff'),
+            {'cutoff': cutoff},
+        ).rowcount
+        if deleted:
+            dropped.append(f'{default_table} ({deleted} rows)')
+        for month_table in _children(connection, platform_table):
+            month = _month_from_partition_name(month_table)
+            if month is None or month >= cutoff:
+                continue
+            connection.execute(f'ALTER TABLE "{platform_table}" DETACH PARTITION "{month_table}"')
+            connection.execute(f'DROP TABLE "{month_table}"')
+            dropped.append(month_table)
+
+    return dropped
+
+
+def partition_sizes(connection) -> t.List[t.Tuple[str, int, int]]:
+    """
+    Метод возвращает размеры листовых партиций истории
+    @return: список (имя партиции, число строк по статистике, размер в байтах)
+    """
+    rows = connection.execute(
+        text(
+            """
+            SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+            FROM pg_partition_tree(CAST(:table AS regclass)) tree
+            JOIN pg_class c ON c.oid = tree.relid
+            WHERE tree.isleaf
+            ORDER BY c.relname
+            """
+        ),
+        {'table': HISTORY_TABLE},
+    )
+    return [(name, max(rows_estimate, 0), size) for name, rows_estimate, size in rows]
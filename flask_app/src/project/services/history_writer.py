@@ -0,0 +1,167 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import typing as t
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from project import database, settings
+from project.core.metrics import (
+    HISTORY_DROPPED_ROWS,
+    HISTORY_FLUSH_ERRORS,
+    HISTORY_FLUSH_LATENCY,
+    HISTORY_FLUSHED_ROWS,
+    HISTORY_QUEUE_DEPTH,
+    HISTORY_SYNC_FALLBACKS,
+)
+from project.models.models import UserHistory
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """
+    Отложенная запись истории входов/выходов.
+    Записи складываются в ограниченную очередь и пишутся фоновым потоком (гринлетом под gevent) пачками:
+    один многострочный INSERT на каждую партицию платформы. Пачка сбрасывается при наборе batch_size записей,
+    по истечении flush_interval секунд и при остановке процесса. Если очередь заполнена, put возвращает False
+    и вызывающий код пишет запись синхронно. Неудачная запись пачки повторяется flush_retries раз с экспоненциальной
+    задержкой, после этого строки пишутся по одной и теряется только та, которую не принимает БД.
+    """
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float, flush_retries: int,
+                 flush_backoff: float):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._flush_retries = flush_retries
+        self._flush_backoff = flush_backoff
+        self._app = None
+        self._pid: t.Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def init_app(self, app) -> None:
+        self._app = app
+        atexit.register(self.close)
+
+    def put(self, user_id, activity: str, platform: str) -> bool:
+        """
+        Метод ставит запись истории в очередь
+        @return: False, если очередь заполнена и запись нужно сделать синхронно
+        """
+        self._ensure_started()
+        row = dict(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            activity=activity,
+            platform=platform,
+            created=datetime.utcnow(),
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            HISTORY_SYNC_FALLBACKS.inc()
+            return False
+
+        HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def close(self) -> None:
+        """Сбрасывает в БД все, что осталось в очереди"""
+        self._stopping.set()
+        while rows := self._drain(block=False):
+            self._flush(rows)
+
+    def _ensure_started(self) -> None:
+        # поток стартует в том процессе, который пишет историю (после форка воркера)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='history-writer', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            rows = self._drain(block=True)
+            if rows:
+                self._flush(rows)
+
+    def _drain(self, block: bool) -> t.List[dict]:
+        rows = []
+        deadline = time.monotonic() + self._flush_interval
+        while len(rows) < self._batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    rows.append(self._queue.get(timeout=timeout))
+                else:
+                    rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+        return rows
+
+    def _flush(self, rows: t.List[dict]) -> None:
+        if not rows:
+            return
+
+        started = time.perf_counter()
+        for attempt in range(self._flush_retries + 1):
+            if attempt:
+                time.sleep(self._flush_backoff * 2 ** (attempt - 1))
+            if self._insert(rows):
+                HISTORY_FLUSH_LATENCY.observe(time.perf_counter() - started)
+                HISTORY_FLUSHED_ROWS.inc(len(rows))
+                return
+
+        # пачка так и не записалась: пишем по одной строке, чтобы потерять только ту, которую БД не принимает
+        logger.error('failed to write %s user history rows as a batch, writing them one by one', len(rows))
+        written = 0
+        for row in rows:
+            if self._insert([row]):
+                written += 1
+            else:
+                HISTORY_DROPPED_ROWS.inc()
+                logger.error('dropped user history row %s', row)
+        HISTORY_FLUSHED_ROWS.inc(written)
+
+    def _insert(self, rows: t.List[dict]) -> bool:
+        """
+        Метод пишет строки одним многострочным INSERT на каждую партицию платформы в одной транзакции
+        @return: False, если транзакция откатилась
+        """
+        by_platform = defaultdict(list)
+        for row in rows:
+            by_platform[row['platform']].append(row)
+
+        with self._app.app_context():
+            try:
+                for platform_rows in by_platform.values():
+                    database.session.execute(UserHistory.__table__.insert().values(platform_rows))
+                database.session.commit()
+            except Exception:
+                database.session.rollback()
+                HISTORY_FLUSH_ERRORS.inc()
+                logger.exception('failed to write %s user history rows', len(rows))
+                return False
+            finally:
+                database.session.remove()
+
+        return True
+
+
+history_writer = HistoryWriter(
+    max_queue_size=settings.HISTORY_QUEUE_SIZE,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_SECONDS,
+    flush_retries=settings.HISTORY_FLUSH_RETRIES,
+    flush_backoff=settings.HISTORY_FLUSH_BACKOFF_SECONDS,
+)
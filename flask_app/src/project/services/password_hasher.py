@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from project import settings
+from project.core.metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE_DEPTH
+from project.services.password_schemes import PasswordScheme, get_scheme, identify
+
+INLINE = 'inline'
+THREAD = 'thread'
+PROCESS = 'process'
+MODES = (INLINE, THREAD, PROCESS)
+
+
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей вне гевент-хаба.
+    PBKDF2 занимает десятки миллисекунд CPU и, выполненный в гринлете запроса, останавливает все запросы воркера.
+    В режиме thread вызов уходит в пул нативных потоков gevent (hashlib отпускает GIL на время PBKDF2),
+    в режиме process - в пул процессов. Гринлет запроса ждет результат, не блокируя остальные.
+    Пулы создаются лениво в том процессе, который хэширует (после форка воркера).
+    """
+
+    def __init__(self, scheme: PasswordScheme, mode: str, workers: int):
+        if mode not in MODES:
+            raise ValueError(f'unknown password hasher mode: {mode}')
+
+        self._scheme = scheme
+        self._mode = mode
+        self._workers = workers
+        self._pool = None
+        self._pid: t.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def hash(self, password: str) -> str:
+        """
+        Метод хэширования пароля
+        @param password: пароль в открытом виде
+        @return: хэш пароля по настроенной схеме
+        """
+        return self._call('hash', self._scheme.hash, password)
+
+    def verify(self, password_hashed: str, password: str) -> bool:
+        """
+        Метод проверки пароля
+        @param password_hashed: сохраненный хэш
+        @param password: пароль в открытом виде
+        @return: пароль верный
+        """
+        return self._call('verify', identify(password_hashed).verify, password_hashed, password)
+
+    def needs_rehash(self, password_hashed: str) -> bool:
+        """
+        Метод проверки, создан ли хэш другой схемой или с устаревшими параметрами
+        @param password_hashed: сохраненный хэш
+        @return: хэш нужно пересчитать
+        """
+        return self._scheme.needs_rehash(password_hashed)
+
+    def _call(self, operation: str, func: t.Callable, *args):
+        started = time.perf_counter()
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        try:
+            if self._mode == INLINE:
+                return func(*args)
+            if self._mode == THREAD:
+                return self._get_pool().apply(func, args)
+            return self._get_pool().submit(func, *args).result()
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+            PASSWORD_HASH_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    def _get_pool(self):
+        if self._pid == os.getpid():
+            return self._pool
+
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._mode == THREAD:
+                    # пул gevent запускает настоящие потоки ОС даже после monkey.patch_all
+                    from gevent.threadpool import ThreadPool
+
+                    self._pool = ThreadPool(self._workers)
+                else:
+                    self._pool = ProcessPoolExecutor(max_workers=self._workers)
+                self._pid = os.getpid()
+
+        return self._pool
+
+
+password_hasher = PasswordHasher(
+    scheme=get_scheme(settings.PASSWORD_HASH_SCHEME),
+    mode=settings.PASSWORD_HASHER_MODE,
+    workers=settings.PASSWORD_HASHER_WORKERS,
+)
@@ -0,0 +1,167 @@
+import abc
+import hashlib
+import hmac
+import typing as t
+
+from werkzeug.security import check_password_hash, gen_salt, generate_password_hash
+
+from project import settings
+
+SALT_LENGTH = 16
+
+
+class PasswordScheme(abc.ABC):
+    """
+    Схема хэширования паролей.
+    Параметры хэша хранятся в самой строке хэша, поэтому проверка не зависит от текущих настроек,
+    а needs_rehash сравнивает их с настроенными. Объекты схем передаются в пул процессов, поэтому должны
+    сериализоваться pickle.
+    """
+    name = ''
+
+    @abc.abstractmethod
+    def hash(self, password: str) -> str:
+        ...
+
+    @abc.abstractmethod
+    def verify(self, password_hashed: str, password: str) -> bool:
+        ...
+
+    def identifies(self, password_hashed: str) -> bool:
+        return password_hashed.startswith(f'{self.name}:')
+
+    @abc.abstractmethod
+    def needs_rehash(self, password_hashed: str) -> bool:
+        ...
+
+
+class Pbkdf2Scheme(PasswordScheme):
+    """PBKDF2-SHA256 в формате werkzeug: pbkdf2:sha256:<iterations>$<salt>$<hash>"""
+    name = 'pbkdf2'
+
+    def __init__(self, iterations: int):
+        self.iterations = iterations
+
+    @property
+    def method(self) -> str:
+        return f'pbkdf2:sha256:{self.iterations}'
+
+    def hash(self, password: str) -> str:
+        return generate_password_hash(password, method=self.method, salt_length=SALT_LENGTH)
+
+    def verify(self, password_hashed: str, password: str) -> bool:
+        return check_password_hash(password_hashed, password)
+
+    def needs_rehash(self, password_hashed: str) -> bool:
+        return password_hashed.split('$', 1)[0] != self.method
+
+
+class ScryptScheme(PasswordScheme):
+    """scrypt из hashlib в формате werkzeug>=3: scrypt:<n>:<r>:<p>$<salt>$<hash>"""
+    name = 'scrypt'
+
+    def __init__(self, n: int, r: int, p: int):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @property
+    def method(self) -> str:
+        return f'scrypt:{self.n}:{self.r}:{self.p}'
+
+    @staticmethod
+    def _derive(password: str, salt: str, n: int, r: int, p: int) -> str:
+        return hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p,
+        ).hex()
+
+    def hash(self, password: str) -> str:
+        salt = gen_salt(SALT_LENGTH)
+        return f'{self.method}${salt}${self._derive(password, salt, self.n, self.r, self.p)}'
+
+    def verify(self, password_hashed: str, password: str) -> bool:
+        try:
+            method, salt, expected = password_hashed.split('$', 2)
+            _, n, r, p = method.split(':')
+            actual = self._derive(password, salt, int(n), int(r), int(p))
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, password_hashed: str) -> bool:
+        return password_hashed.split('$', 1)[0] != self.method
+
+
+class Argon2Scheme(PasswordScheme):
+    """argon2id из опциональной зависимости argon2-cffi в стандартном формате $argon2id$v=19$m=...,t=...,p=...$..."""
+    name = 'argon2'
+
+    def __init__(self, time_cost: int, memory_cost: int, parallelism: int):
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self.parallelism = parallelism
+
+    @staticmethod
+    def _argon2():
+        try:
+            import argon2
+        except ImportError:
+            raise RuntimeError('argon2 password scheme requires the argon2-cffi package') from None
+
+        return argon2
+
+    def _hasher(self):
+        return self._argon2().PasswordHasher(
+            time_cost=self.time_cost, memory_cost=self.memory_cost, parallelism=self.parallelism,
+        )
+
+    def hash(self, password: str) -> str:
+        return self._hasher().hash(password)
+
+    def verify(self, password_hashed: str, password: str) -> bool:
+        exceptions = self._argon2().exceptions
+        try:
+            return self._hasher().verify(password_hashed, password)
+        except (exceptions.InvalidHash, exceptions.VerificationError):
+            return False
+
+    def identifies(self, password_hashed: str) -> bool:
+        return password_hashed.startswith('$argon2')
+
+    def needs_rehash(self, password_hashed: str) -> bool:
+        return not self.identifies(password_hashed) or self._hasher().check_needs_rehash(password_hashed)
+
+
+password_schemes: t.Dict[str, PasswordScheme] = {
+    scheme.name: scheme
+    for scheme in (
+        Pbkdf2Scheme(iterations=settings.PASSWORD_PBKDF2_ITERATIONS),
+        ScryptScheme(n=settings.PASSWORD_SCRYPT_N, r=settings.PASSWORD_SCRYPT_R, p=settings.PASSWORD_SCRYPT_P),
+        Argon2Scheme(
+            time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+            memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+            parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        ),
+    )
+}
+
+
+def get_scheme(name: str) -> PasswordScheme:
+    if name not in password_schemes:
+        raise ValueError(f'unknown password hash scheme: {name}')
+
+    return password_schemes[name]
+
+
+def identify(password_hashed: str) -> PasswordScheme:
+    """
+    Метод определения схемы по строке хэша
+    @param password_hashed: сохраненный хэш
+    @return: схема, которой создан хэш; прочие форматы werkzeug проверяет схема pbkdf2
+    """
+    for scheme in password_schemes.values():
+        if scheme.identifies(password_hashed):
+            return scheme
+
+    return password_schemes[Pbkdf2Scheme.name]
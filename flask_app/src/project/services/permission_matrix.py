@@ -0,0 +1,90 @@
+import threading
+import time
+import typing as t
+
+from project import redis, settings
+from project.core.permissions import permissions_to_mask
+from project.models.models import Permission, RolePermission
+from project.utils.instrumentation import uncounted_calls
+
+PERMISSIONS_VERSION_KEY = 'permissions:version'
+
+
+class PermissionMatrix:
+    """
+    Скомпилированная в памяти воркера матрица доступа: role_id -> frozenset имен выданных пермишенов.
+    Матрица строится одним запросом к БД и перестраивается только при изменении счетчика версии в Redis,
+    который увеличивается при любом изменении ролей.
+    """
+
+    def __init__(self, version_check_interval: float):
+        self._version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+        self._matrix: t.Dict[str, t.FrozenSet[str]] = {}
+        self._masks: t.Dict[str, int] = {}
+        self._version: t.Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> int:
+        """Текущая версия матрицы (по данным Redis, не старше version_check_interval секунд)"""
+        self._refresh_if_stale()
+        return self._version
+
+    def granted(self, role_id) -> t.FrozenSet[str]:
+        """
+        Метод возвращает имена пермишенов, выданных роли
+        @param role_id: идентификатор роли
+        @return: множество имен пермишенов со значением true
+        """
+        self._refresh_if_stale()
+        return self._matrix.get(str(role_id), frozenset())
+
+    def mask(self, role_id) -> int:
+        """Битовая маска пермишенов роли, см. PERMISSION_BITS"""
+        self._refresh_if_stale()
+        return self._masks.get(str(role_id), 0)
+
+    def has_any(self, role_id, permission_names: t.Iterable[str]) -> bool:
+        granted = self.granted(role_id)
+        return any(name in granted for name in permission_names)
+
+    def invalidate(self) -> None:
+        """Увеличивает версию в Redis, чтобы все воркеры перестроили матрицу"""
+        redis.incr(PERMISSIONS_VERSION_KEY)
+        self._checked_at = 0.0
+
+    @uncounted_calls()
+    def _refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self._version_check_interval:
+            return
+
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self._version_check_interval:
+                return
+            version = int(redis.get(PERMISSIONS_VERSION_KEY) or 0)
+            if version != self._version:
+                self._matrix = self._build()
+                self._masks = {role_id: permissions_to_mask(names) for role_id, names in self._matrix.items()}
+                self._version = version
+            self._checked_at = now
+
+    @staticmethod
+    def _build() -> t.Dict[str, t.FrozenSet[str]]:
+        rows = (
+            RolePermission.query
+            .join(Permission, Permission.id == RolePermission.permission_id)
+            .with_entities(RolePermission.role_id, Permission.name, RolePermission.value)
+            .all()
+        )
+        matrix: t.Dict[str, t.Set[str]] = {}
+        for role_id, permission_name, value in rows:
+            granted = matrix.setdefault(str(role_id), set())
+            if value.lower() == 'true':
+                granted.add(permission_name)
+
+        return {role_id: frozenset(names) for role_id, names in matrix.items()}
+
+
+permission_matrix = PermissionMatrix(version_check_interval=settings.PERMISSIONS_VERSION_CHECK_SECONDS)
@@ -0,0 +1,129 @@
+import typing as t
+import uuid
+from datetime import timedelta
+
+from redis import Redis
+
+from project import redis, settings
+from project.core.metrics import REFRESH_ROTATIONS
+
+REFRESH_FAMILY_KEY_PREFIX = 'refresh:'
+
+ROTATED = 'rotated'
+RETRIED = 'retried'
+EXPIRED = 'expired'
+REUSED = 'reused'
+THROTTLED = 'throttled'
+
+# Значение ключа семьи: "jti текущего токена|время последней ротации в мс|jti предыдущего токена".
+# Время берется из Redis TIME и при создании семьи, и при ротации, поэтому часы воркеров не влияют на интервалы.
+TIME_SCRIPT_PREFIX = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+"""
+
+# Создание семьи. KEYS[1] - ключ семьи, ARGV[1] - jti первого токена, ARGV[2] - время жизни семьи в мс.
+START_SCRIPT = TIME_SCRIPT_PREFIX + """
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. now .. '|', 'PX', ARGV[2])
+"""
+
+# Ротация refresh-токена семьи за один вызов EVALSHA (compare-and-set текущего jti).
+# KEYS[1] - ключ семьи, ARGV[1] - предъявленный jti, ARGV[2] - новый jti,
+# ARGV[3] - минимальный интервал между ротациями в мс, ARGV[4] - окно повтора в мс.
+# Предыдущий jti в течение окна повтора после ротации снова ротируется без ограничения интервала: клиент повторил
+# запрос, ответ на который потерялся. Предъявление другого не текущего jti означает повторное использование:
+# семья удаляется целиком.
+# TTL ключа при ротации сохраняется, поэтому сессия живет не дольше времени жизни refresh-токена с момента логина.
+# Возвращает {код, retry_after_ms}: 1 - ротирован, 2 - ротирован повтор предыдущего токена, 0 - семьи нет,
+# -1 - повторное использование, -2 - слишком часто.
+ROTATE_SCRIPT = TIME_SCRIPT_PREFIX + """
+local value = redis.call('GET', KEYS[1])
+if not value then
+    return {0, 0}
+end
+local current, rotated, previous = string.match(value, '^([^|]*)|(%d+)|?([^|]*)$')
+rotated = tonumber(rotated)
+if ARGV[1] == current then
+    local retry = rotated + tonumber(ARGV[3]) - now
+    if retry > 0 then
+        return {-2, retry}
+    end
+    redis.call('SET', KEYS[1], ARGV[2] .. '|' .. now .. '|' .. current, 'KEEPTTL')
+    return {1, 0}
+end
+if ARGV[1] == previous and now - rotated <= tonumber(ARGV[4]) then
+    redis.call('SET', KEYS[1], ARGV[2] .. '|' .. rotated .. '|' .. previous, 'KEEPTTL')
+    return {2, 0}
+end
+redis.call('DEL', KEYS[1])
+return {-1, 0}
+"""
+
+_ROTATE_RESULTS = {1: ROTATED, 2: RETRIED, 0: EXPIRED, -1: REUSED, -2: THROTTLED}
+
+
+class RotationResult(t.NamedTuple):
+    status: str
+    retry_after: float
+
+
+class RefreshTokenFamilies:
+    """
+    Семьи refresh-токенов: одна семья на логин, в Redis хранятся jti текущего и предыдущего токенов семьи
+    и время ротации.
+    Каждое обновление выдает новый refresh-токен и делает предыдущий недействительным. Исключение - повтор
+    с предыдущим токеном в течение reuse_grace секунд после ротации (ответ на обновление не дошел до клиента).
+    Остальные предъявления уже использованного токена (его украли) отзывают всю семью.
+    Обновлять токены семьи можно не чаще раза в min_interval секунд.
+    """
+
+    def __init__(self, client: Redis, lifetime: timedelta, min_interval: float, reuse_grace: float):
+        self._client = client
+        self._lifetime_ms = int(lifetime.total_seconds() * 1000)
+        self._min_interval_ms = int(min_interval * 1000)
+        self._reuse_grace_ms = int(reuse_grace * 1000)
+        self._start_script = client.register_script(START_SCRIPT)
+        self._rotate_script = client.register_script(ROTATE_SCRIPT)
+
+    def start(self) -> t.Tuple[str, str]:
+        """
+        Метод создает семью для нового логина
+        @return: идентификатор семьи и jti ее первого refresh-токена
+        """
+        family, jti = uuid.uuid4().hex, str(uuid.uuid4())
+        self._start_script(keys=[self._key(family)], args=[jti, self._lifetime_ms])
+        return family, jti
+
+    def rotate(self, family: str, jti: str, new_jti: str) -> RotationResult:
+        """
+        Метод атомарно заменяет текущий refresh-токен семьи
+        @param family: идентификатор семьи из токена
+        @param jti: jti предъявленного refresh-токена
+        @param new_jti: jti refresh-токена, который будет выдан
+        @return: результат ротации
+        """
+        code, retry_after_ms = self._rotate_script(
+            keys=[self._key(family)], args=[jti, new_jti, self._min_interval_ms, self._reuse_grace_ms],
+        )
+        status = _ROTATE_RESULTS[code]
+        REFRESH_ROTATIONS.labels(status).inc()
+        return RotationResult(status=status, retry_after=retry_after_ms / 1000)
+
+    def revoke(self, family: str) -> None:
+        """Отзывает семью: все ее refresh-токены становятся недействительными"""
+        self._client.delete(self._key(family))
+
+    @staticmethod
+    def _key(family: str) -> str:
+        return f'{REFRESH_FAMILY_KEY_PREFIX}{family}'
+
+
+refresh_token_families = RefreshTokenFamilies(
+    redis,
+    lifetime=timedelta(settings.REFRESH_EXPIRES_IN_DAYS),
+    min_interval=settings.REFRESH_MIN_INTERVAL_SECONDS,
+    reuse_grace=settings.REFRESH_REUSE_GRACE_SECONDS,
+)
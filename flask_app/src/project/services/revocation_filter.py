@@ -0,0 +1,118 @@
+import threading
+import time
+import typing as t
+from datetime import timedelta
+
+from redis import Redis
+
+from project.core.metrics import (
+    REVOCATION_FILTER_CHECKS,
+    REVOCATION_FILTER_FALSE_POSITIVES,
+    REVOCATION_FILTER_HITS,
+    REVOCATION_FILTER_POSSIBLE_HITS,
+    REVOCATION_FILTER_SIZE,
+    REVOCATION_FILTER_SYNC_LAG,
+)
+from project.utils.bloom_filter import BloomFilter
+from project.utils.instrumentation import uncounted_calls
+
+REVOKED_STREAM_KEY = 'jwt:revoked'
+SYNC_BATCH_SIZE = 1000
+
+
+class RevocationFilter:
+    """
+    Локальный фильтр отозванных токенов перед блоклистом в Redis.
+    Отзыв токена пишется в блоклист и в поток Redis, воркеры дочитывают поток не чаще раза в sync_interval секунд.
+    В Redis ходим только если фильтр сообщил о возможном попадании.
+    Фильтров два поколения, каждое живет retention (время жизни токена), чтобы фильтр не рос бесконечно.
+    """
+
+    def __init__(self, client: Redis, capacity: int, error_rate: float, sync_interval: float, retention: timedelta):
+        self._client = client
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._sync_interval = sync_interval
+        self._retention = retention.total_seconds()
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+        self._last_id = '0-0'
+        self._synced_at: t.Optional[float] = None
+
+    def revoke(self, jti: str, expires: timedelta) -> None:
+        """
+        Метод отзывает токен: запись в блоклист и публикация в поток одним пайплайном
+        @param jti: идентификатор токена
+        @param expires: время хранения записи в блоклисте
+        """
+        min_id = f'{int((time.time() - self._retention) * 1000)}-0'
+        pipe = self._client.pipeline(transaction=False)
+        pipe.set(jti, '', ex=expires)
+        pipe.xadd(REVOKED_STREAM_KEY, {'jti': jti}, minid=min_id, approximate=True)
+        pipe.execute()
+        with self._lock:
+            self._current.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        self._sync_if_stale()
+        REVOCATION_FILTER_CHECKS.inc()
+        if jti not in self._current and jti not in self._previous:
+            return False
+
+        REVOCATION_FILTER_POSSIBLE_HITS.inc()
+        if self._client.get(jti) is None:
+            REVOCATION_FILTER_FALSE_POSITIVES.inc()
+            return False
+
+        REVOCATION_FILTER_HITS.inc()
+        return True
+
+    def revoked(self, jtis: t.Sequence[str]) -> t.Set[str]:
+        """
+        Метод проверяет пачку токенов: фильтр в памяти, затем один MGET для возможных попаданий
+        @param jtis: идентификаторы токенов
+        @return: отозванные из них
+        """
+        self._sync_if_stale()
+        REVOCATION_FILTER_CHECKS.inc(len(jtis))
+        candidates = [jti for jti in jtis if jti in self._current or jti in self._previous]
+        if not candidates:
+            return set()
+
+        REVOCATION_FILTER_POSSIBLE_HITS.inc(len(candidates))
+        revoked = {jti for jti, value in zip(candidates, self._client.mget(candidates)) if value is not None}
+        REVOCATION_FILTER_FALSE_POSITIVES.inc(len(candidates) - len(revoked))
+        REVOCATION_FILTER_HITS.inc(len(revoked))
+        return revoked
+
+    @uncounted_calls()
+    def _sync_if_stale(self) -> None:
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self._sync_interval:
+            return
+
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self._sync_interval:
+                return
+            if now - self._rotated_at >= self._retention:
+                self._previous, self._current = self._current, BloomFilter(self._capacity, self._error_rate)
+                self._rotated_at = now
+
+            while True:
+                response = self._client.xread({REVOKED_STREAM_KEY: self._last_id}, count=SYNC_BATCH_SIZE)
+                entries = response[0][1] if response else []
+                for entry_id, fields in entries:
+                    jti = fields.get('jti') or fields.get(b'jti')
+                    self._current.add(jti.decode() if isinstance(jti, bytes) else jti)
+                    self._last_id = entry_id
+                if entries:
+                    last_id = self._last_id.decode() if isinstance(self._last_id, bytes) else self._last_id
+                    published_at = int(last_id.split('-')[0]) / 1000
+                    REVOCATION_FILTER_SYNC_LAG.set(max(0.0, time.time() - published_at))
+                if len(entries) < SYNC_BATCH_SIZE:
+                    break
+
+            REVOCATION_FILTER_SIZE.set(self._current.count + self._previous.count)
+            self._synced_at = now
@@ -0,0 +1,90 @@
+import json
+import typing as t
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from project import redis, settings
+from project.models.models import Role, RolePermission
+from project.services.permission_matrix import PERMISSIONS_VERSION_KEY
+
+ROLE_KEY_PREFIX = 'role:'
+ROLES_KEY_PREFIX = 'roles:'
+
+
+class RoleCache:
+    """
+    Денормализованная модель чтения ролей в Redis: роль с именами и значениями ее пермишенов.
+    Ключи содержат версию матрицы доступа, которая увеличивается при любом изменении ролей,
+    поэтому после изменения все воркеры читают новые ключи, а старые истекают по TTL.
+    Версия читается из Redis при каждом чтении роли, а не из локальной копии воркера,
+    поэтому измененная роль не отдается из кэша ни одним воркером.
+    Промах кэша стоит одного запроса к БД.
+    """
+
+    def __init__(self, ttl: int):
+        self._ttl = ttl
+
+    def get(self, role_id) -> t.Optional[dict]:
+        """
+        Метод возвращает роль с пермишенами
+        @param role_id: идентификатор роли
+        @return: dict(id, name, created, permissions=[dict(id, name, value)]) или None, если роли нет
+        """
+        key = f'{ROLE_KEY_PREFIX}{self._version()}:{role_id}'
+        raw = redis.get(key)
+        if raw is not None:
+            return self._loads(raw)
+
+        role = (
+            Role.query
+            .options(joinedload(Role.role_permissions).joinedload(RolePermission.permission))
+            .filter(Role.id == role_id)
+            .first()
+        )
+        if not role:
+            return None
+
+        role_dict = dict(
+            id=str(role.id),
+            name=role.name,
+            created=role.created.isoformat() if role.created else None,
+            permissions=[
+                dict(id=str(role_permission.permission_id),
+                     name=role_permission.permission.name,
+                     value=role_permission.value)
+                for role_permission in role.role_permissions
+            ],
+        )
+        raw = json.dumps(role_dict)
+        redis.set(key, raw, ex=self._ttl)
+        return self._loads(raw)
+
+    def all(self) -> t.List[dict]:
+        """Список ролей dict(id, name), отсортированный по имени"""
+        key = f'{ROLES_KEY_PREFIX}{self._version()}'
+        raw = redis.get(key)
+        if raw is not None:
+            return json.loads(raw)
+
+        roles = [
+            dict(id=str(role_id), name=name)
+            for role_id, name in Role.query.with_entities(Role.id, Role.name).order_by(Role.name)
+        ]
+        redis.set(key, json.dumps(roles), ex=self._ttl)
+        return roles
+
+    @staticmethod
+    def _version() -> int:
+        return int(redis.get(PERMISSIONS_VERSION_KEY) or 0)
+
+    @staticmethod
+    def _loads(raw: t.Union[str, bytes]) -> dict:
+        role_dict = json.loads(raw)
+        if role_dict['created']:
+            role_dict['created'] = datetime.fromisoformat(role_dict['created'])
+
+        return role_dict
+
+
+role_cache = RoleCache(ttl=settings.ROLE_CACHE_TTL_SECONDS)
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import typing as t
+from datetime import datetime, timedelta, timezone
+
+from flask import g
+from jwt import InvalidTokenError
+
+from project import jwt, settings
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'EdDSA')
+KEY_FILE_SUFFIX = '.pem'
+KID_TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+
+class SigningKey(t.NamedTuple):
+    kid: str
+    created: float
+    private_key: t.Any
+    public_key: t.Any
+
+
+def new_kid() -> str:
+    """Идентификатор ключа начинается со времени создания: сортировка по kid совпадает с порядком создания"""
+    return f'{datetime.now(timezone.utc):{KID_TIME_FORMAT}}-{secrets.token_hex(4)}'
+
+
+def kid_created(kid: str) -> float:
+    return datetime.strptime(kid.split('-')[0], KID_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def generate_key(keys_dir: str, algorithm: str, rsa_bits: int = 2048) -> str:
+    """
+    Метод создает закрытый ключ подписи и сохраняет его в keys_dir в PEM (PKCS8)
+    @param keys_dir: каталог ключей
+    @param algorithm: RS256 или EdDSA (Ed25519)
+    @param rsa_bits: длина ключа RSA
+    @return: kid нового ключа
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=rsa_bits)
+    elif algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f'algorithm {algorithm} is not asymmetric, expected one of {ASYMMETRIC_ALGORITHMS}')
+
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    kid = new_kid()
+    os.makedirs(keys_dir, mode=0o700, exist_ok=True)
+    descriptor = os.open(os.path.join(keys_dir, f'{kid}{KEY_FILE_SUFFIX}'), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, 'wb') as key_file:
+        key_file.write(pem)
+
+    return kid
+
+
+def _load_key(path: str, algorithm: str):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    with open(path, 'rb') as key_file:
+        private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+
+    expected = rsa.RSAPrivateKey if algorithm == 'RS256' else ed25519.Ed25519PrivateKey
+    return private_key if isinstance(private_key, expected) else None
+
+
+def _to_jwk(key: SigningKey, algorithm: str) -> dict:
+    from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+    to_jwk = RSAAlgorithm.to_jwk if algorithm == 'RS256' else OKPAlgorithm.to_jwk
+    jwk = json.loads(to_jwk(key.public_key))
+    # use и key_ops не должны встречаться вместе (RFC 7517, 4.3)
+    jwk.pop('key_ops', None)
+    return {**jwk, 'kid': key.kid, 'alg': algorithm, 'use': 'sig'}
+
+
+class SigningKeys:
+    """
+    Ключи асимметричной подписи JWT (RS256 или EdDSA) из каталога: один PEM-файл на ключ, имя файла - kid.
+    Новый ключ сразу публикуется в JWKS, а подписывать токены начинает через activation_delay секунд после создания,
+    чтобы сервисы, кэширующие JWKS, успели его получить. Старые ключи остаются в JWKS для проверки уже выданных токенов.
+    Каталог перечитывается не чаще раза в reload_interval секунд, если изменилось его содержимое.
+    При HS256 ключи не используются, токены подписываются SECRET_KEY.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: str, activation_delay: float, reload_interval: float):
+        self._algorithm = algorithm
+        self._keys_dir = keys_dir
+        self._activation_delay = activation_delay
+        self._reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._keys: t.Tuple[SigningKey, ...] = ()
+        self._jwks = json.dumps({'keys': []})
+        self._dir_mtime: t.Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def algorithm(self) -> str:
+        return self._algorithm
+
+    @property
+    def is_asymmetric(self) -> bool:
+        return self._algorithm in ASYMMETRIC_ALGORITHMS
+
+    def init_app(self, app) -> None:
+        app.config['JWT_ALGORITHM'] = self._algorithm
+        if not self.is_asymmetric:
+            return
+
+        try:
+            self.load()
+        except RuntimeError:
+            # ключ можно создать командой flask keys generate уже после старта, воркеры подхватят его при перечитывании
+            logger.warning('no %s JWT signing keys in %s yet, tokens cannot be issued', self._algorithm, self._keys_dir)
+        jwt.additional_headers_loader(self._headers_callback)
+        jwt.encode_key_loader(self._encode_key_callback)
+        jwt.decode_key_loader(self._decode_key_callback)
+
+    def load(self) -> None:
+        """Перечитывает ключи из каталога"""
+        keys = []
+        names = sorted(os.listdir(self._keys_dir)) if os.path.isdir(self._keys_dir) else []
+        for name in names:
+            if not name.endswith(KEY_FILE_SUFFIX):
+                continue
+            kid = name[:-len(KEY_FILE_SUFFIX)]
+            try:
+                created = kid_created(kid)
+            except ValueError:
+                # время создания берется из имени файла: чужой PEM в каталоге не должен останавливать запуск
+                logger.warning('skipping JWT key file %s: name is not a kid from "flask keys generate"', name)
+                continue
+            private_key = _load_key(os.path.join(self._keys_dir, name), self._algorithm)
+            if private_key is None:
+                logger.warning('skipping JWT key %s: it is not a %s key', kid, self._algorithm)
+                continue
+            keys.append(SigningKey(kid, created, private_key, private_key.public_key()))
+
+        if not keys:
+            raise RuntimeError(f'no {self._algorithm} JWT signing keys in {self._keys_dir}, run "flask keys generate"')
+
+        with self._lock:
+            self._keys = tuple(keys)
+            self._jwks = json.dumps({'keys': [_to_jwk(key, self._algorithm) for key in reversed(keys)]})
+            self._dir_mtime = os.stat(self._keys_dir).st_mtime_ns
+            self._checked_at = time.monotonic()
+
+    @property
+    def keys(self) -> t.Tuple[SigningKey, ...]:
+        """Загруженные ключи от старых к новым"""
+        self._reload_if_changed()
+        return self._keys
+
+    def active(self, now: t.Optional[float] = None) -> SigningKey:
+        """
+        Метод возвращает ключ, которым сейчас подписываются токены
+        @param now: текущее время (для тестов и CLI)
+        @return: самый новый ключ, с создания которого прошло activation_delay, или самый старый, если таких нет
+        """
+        keys = self.keys
+        if not keys:
+            raise RuntimeError(f'no {self._algorithm} JWT signing keys in {self._keys_dir}')
+        now = time.time() if now is None else now
+        for key in reversed(keys):
+            if key.created + self._activation_delay <= now:
+                return key
+
+        return keys[0]
+
+    def public_key(self, kid: t.Optional[str]):
+        for key in self.keys:
+            if key.kid == kid:
+                return key.public_key
+
+        return None
+
+    def jwks(self) -> str:
+        """JSON Web Key Set с открытыми ключами всех загруженных ключей"""
+        if self.is_asymmetric:
+            self._reload_if_changed()
+        return self._jwks
+
+    def retired(self, retention: timedelta, now: t.Optional[float] = None) -> t.List[SigningKey]:
+        """
+        Метод возвращает ключи, которые можно удалить
+        @param retention: максимальное время жизни токенов
+        @param now: текущее время
+        @return: ключи, которые перестали подписывать токены больше retention назад
+        """
+        keys = self.keys
+        now = time.time() if now is None else now
+        retired = []
+        for key, successor in zip(keys, keys[1:]):
+            if successor.created + self._activation_delay + retention.total_seconds() <= now:
+                retired.append(key)
+
+        return retired
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return
+        self._checked_at = now
+        try:
+            changed = os.stat(self._keys_dir).st_mtime_ns != self._dir_mtime
+        except OSError:
+            return
+        if not changed:
+            return
+        try:
+            self.load()
+        except (OSError, ValueError, RuntimeError):
+            # каталог меняется прямо сейчас или в нем битый ключ: продолжаем с уже загруженными ключами
+            logger.exception('failed to reload JWT signing keys from %s', self._keys_dir)
+
+    def _headers_callback(self, identity) -> dict:
+        # ключ выбирается один раз на токен: kid в заголовке и ключ подписи не разойдутся на границе активации
+        key = self.active()
+        g.jwt_signing_key = key
+        return {'kid': key.kid}
+
+    def _encode_key_callback(self, identity):
+        key = g.pop('jwt_signing_key', None) or self.active()
+        return key.private_key
+
+    def _decode_key_callback(self, jwt_header: dict, jwt_payload: dict):
+        public_key = self.public_key(jwt_header.get('kid'))
+        if public_key is None:
+            raise InvalidTokenError('Unknown signing key')
+
+        return public_key
+
+
+signing_keys = SigningKeys(
+    algorithm=settings.JWT_ALGORITHM,
+    keys_dir=settings.JWT_KEYS_DIR,
+    activation_delay=settings.JWT_KEY_ACTIVATION_SECONDS,
+    reload_interval=settings.JWT_KEYS_RELOAD_SECONDS,
+)
@@ -0,0 +1,208 @@
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from sqlalchemy import or_
+
+from project import database, redis, settings
+from project.models.models import User
+
+USER_STATE_KEY_PREFIX = 'user_state:'
+
+# email из токена (claim sub) и идентификатор пользователя из токена, если есть
+Identity = t.Tuple[str, t.Optional[str]]
+
+
+class UserState:
+    """Минимальный набор полей пользователя, нужный для проверок доступа"""
+    __slots__ = ('id', 'role_id', 'disabled')
+
+    def __init__(self, id, role_id, disabled: bool):
+        self.id = id
+        self.role_id = role_id
+        self.disabled = disabled
+
+    def dumps(self) -> str:
+        return f'{self.id}|{self.role_id or ""}|{int(self.disabled)}'
+
+    @classmethod
+    def loads(cls, raw: t.Union[str, bytes]) -> 'UserState':
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        user_id, role_id, disabled = raw.split('|')
+        return cls(id=user_id, role_id=role_id or None, disabled=disabled == '1')
+
+    def __repr__(self):
+        return f'<UserState {self.id}>'
+
+
+class UserStateCache:
+    """
+    Кэш состояния пользователей по identity токена (email).
+    Порядок поиска: LRU в памяти воркера с коротким TTL -> Redis -> БД (по первичному ключу, если он известен).
+    Локальный TTL ограничивает время, в течение которого другие воркеры видят устаревшее состояние после invalidate.
+    Email из токена мог с тех пор перейти к другому пользователю: закэшированное состояние с чужим id не используется,
+    а строка, найденная по первичному ключу, кэшируется под email токена, только если это ее текущий email.
+    """
+
+    def __init__(self, max_size: int, local_ttl: float, redis_ttl: int):
+        self._max_size = max_size
+        self._local_ttl = local_ttl
+        self._redis_ttl = redis_ttl
+        self._lock = threading.Lock()
+        self._local: 'OrderedDict[str, t.Tuple[float, UserState]]' = OrderedDict()
+
+    def get(self, identity: str, user_id: t.Optional[str] = None) -> t.Optional[UserState]:
+        """
+        Метод возвращает состояние пользователя
+        @param identity: email пользователя из токена
+        @param user_id: идентификатор пользователя из токена, если есть
+        @return: состояние пользователя или None, если пользователь не найден
+        """
+        key = (identity, user_id)
+        state = self._get_local(identity)
+        if self._matches(state, key):
+            return state
+
+        raw = redis.get(f'{USER_STATE_KEY_PREFIX}{identity}')
+        state = UserState.loads(raw) if raw else None
+        if self._matches(state, key):
+            self._set_local(identity, state)
+            return state
+
+        state, email = self._load(identity, user_id)
+        if state and email == identity:
+            redis.set(f'{USER_STATE_KEY_PREFIX}{identity}', state.dumps(), ex=self._redis_ttl)
+            self._set_local(identity, state)
+
+        return state
+
+    def get_many(self, identities: t.Iterable[Identity]) -> t.Dict[Identity, UserState]:
+        """
+        Метод возвращает состояние пачки пользователей: память воркера, затем один MGET в Redis,
+        затем один запрос к БД по всем оставшимся
+        @param identities: пары (email из токена, идентификатор пользователя из токена или None)
+        @return: пара -> состояние для найденных пользователей; состояние из кэша с другим id для пары не подходит
+        """
+        identities = list(dict.fromkeys(identities))
+        states = {}
+        for identity in identities:
+            state = self._get_local(identity[0])
+            if self._matches(state, identity):
+                states[identity] = state
+
+        missing = [identity for identity in identities if identity not in states]
+        if not missing:
+            return states
+
+        emails = list(dict.fromkeys(email for email, _ in missing))
+        raw_states = redis.mget([f'{USER_STATE_KEY_PREFIX}{email}' for email in emails])
+        cached = {email: UserState.loads(raw) for email, raw in zip(emails, raw_states) if raw}
+        for identity in missing:
+            state = cached.get(identity[0])
+            if self._matches(state, identity):
+                states[identity] = state
+                self._set_local(identity[0], state)
+
+        missing = [identity for identity in missing if identity not in states]
+        if not missing:
+            return states
+
+        loaded = self._load_many(missing)
+        pipe = redis.pipeline(transaction=False)
+        cached_count = 0
+        for identity, (state, email) in loaded.items():
+            states[identity] = state
+            # строку, найденную по id, под email токена кэшируем, только если email все еще ее
+            if email != identity[0]:
+                continue
+            pipe.set(f'{USER_STATE_KEY_PREFIX}{email}', state.dumps(), ex=self._redis_ttl)
+            self._set_local(email, state)
+            cached_count += 1
+        if cached_count:
+            pipe.execute()
+
+        return states
+
+    def invalidate(self, *identities: str) -> None:
+        """Удаляет состояние пользователей из Redis и из памяти текущего воркера"""
+        if not identities:
+            return
+        with self._lock:
+            for identity in identities:
+                self._local.pop(identity, None)
+        redis.delete(*[f'{USER_STATE_KEY_PREFIX}{identity}' for identity in identities])
+
+    def _get_local(self, identity: str) -> t.Optional[UserState]:
+        with self._lock:
+            item = self._local.get(identity)
+            if not item:
+                return None
+            expires_at, state = item
+            if expires_at < time.monotonic():
+                del self._local[identity]
+                return None
+            self._local.move_to_end(identity)
+            return state
+
+    def _set_local(self, identity: str, state: UserState) -> None:
+        with self._lock:
+            self._local[identity] = (time.monotonic() + self._local_ttl, state)
+            self._local.move_to_end(identity)
+            while len(self._local) > self._max_size:
+                self._local.popitem(last=False)
+
+    @staticmethod
+    def _matches(state: t.Optional[UserState], identity: Identity) -> bool:
+        user_id = identity[1]
+        return state is not None and (not user_id or state.id == user_id)
+
+    @staticmethod
+    def _load(identity: str, user_id: t.Optional[str]) -> t.Tuple[t.Optional[UserState], t.Optional[str]]:
+        """
+        Метод читает состояние пользователя из БД
+        @param identity: email из токена
+        @param user_id: идентификатор пользователя из токена, если есть - поиск по первичному ключу
+        @return: состояние и текущий email пользователя или (None, None)
+        """
+        query = database.session.query(User.id, User.email, User.role_id, User.disabled)
+        if user_id:
+            row = query.filter(User.id == user_id).first()
+        else:
+            row = query.filter(User.email == identity).first()
+        if not row:
+            return None, None
+
+        return _to_state(row), row.email
+
+    @staticmethod
+    def _load_many(identities: t.List[Identity]) -> t.Dict[Identity, t.Tuple[UserState, str]]:
+        user_ids = [user_id for _, user_id in identities if user_id]
+        emails = [email for email, user_id in identities if not user_id]
+        rows = (
+            database.session.query(User.id, User.email, User.role_id, User.disabled)
+            .filter(or_(User.id.in_(user_ids), User.email.in_(emails)))
+            .all()
+        )
+        by_id = {str(row.id): row for row in rows}
+        by_email = {row.email: row for row in rows}
+
+        states = {}
+        for email, user_id in identities:
+            row = by_id.get(user_id) if user_id else by_email.get(email)
+            if row:
+                states[(email, user_id)] = (_to_state(row), row.email)
+
+        return states
+
+
+def _to_state(row) -> UserState:
+    return UserState(id=str(row.id), role_id=str(row.role_id) if row.role_id else None, disabled=row.disabled)
+
+
+user_state_cache = UserStateCache(
+    max_size=settings.USER_STATE_LOCAL_CACHE_SIZE,
+    local_ttl=settings.USER_STATE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.USER_STATE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,31 @@
+import base64
+import binascii
+import json
+import typing as t
+
+
+def encode_cursor(*values: t.Any) -> str:
+    """
+    Метод упаковывает значения ключа последней записи страницы в непрозрачный курсор
+    @param values: значения ключа сортировки
+    @return: строка курсора
+    """
+    raw = json.dumps([str(value) for value in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> t.Optional[t.List[str]]:
+    """
+    Метод распаковывает курсор
+    @param cursor: строка курсора
+    @param size: ожидаемое число значений
+    @return: значения ключа или None, если курсор некорректен
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, str) for value in values):
+        return None
+
+    return values
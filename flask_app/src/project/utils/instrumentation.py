@@ -0,0 +1,153 @@
+import os
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from project.core.metrics import DB_QUERIES, DB_QUERY_ERRORS, DB_QUERY_LATENCY, HTTP_REQUEST_LATENCY
+
+
+DB_QUERIES_HEADER = 'X-DB-Queries'
+REDIS_CALLS_HEADER = 'X-Redis-Calls'
+
+
+def count_request_call(kind: str) -> None:
+    """
+    Метод увеличивает счетчик обращений текущего запроса
+    @param kind: db или redis
+    """
+    if has_request_context():
+        counters = g.get('request_counters')
+        if counters is not None:
+            counters[kind] += 1
+
+
+@contextmanager
+def uncounted_calls():
+    """
+    Обращения внутри блока не попадают в счетчики текущего запроса.
+    Так помечаются периодические синхронизации воркера, которые лишь случайно выполняются в каком-то запросе,
+    иначе бюджет запроса зависел бы от того, пришлась ли на него синхронизация
+    """
+    counters = g.pop('request_counters', None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if counters is not None:
+            g.request_counters = counters
+
+
+def _statement_type(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _observe_query(statement: str, started: float) -> str:
+    statement_type = _statement_type(statement)
+    count_request_call('db')
+    DB_QUERIES.labels(statement_type).inc()
+    DB_QUERY_LATENCY.labels(statement_type).observe(time.perf_counter() - started)
+    return statement_type
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _observe_query(statement, conn.info['query_started'].pop())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute для упавшего запроса не вызывается: снимаем его время со стека здесь.
+    # Ошибки вне выполнения запроса (соединение, commit, чтение результата) приходят без statement,
+    # а упавшая до before_cursor_execute подготовка запроса - при пустом стеке
+    conn = exception_context.connection
+    if exception_context.statement is None or conn is None:
+        return
+    query_started = conn.info.get('query_started')
+    if not query_started:
+        return
+    statement_type = _observe_query(exception_context.statement, query_started.pop())
+    DB_QUERY_ERRORS.labels(statement_type).inc()
+
+
+def instrument_database() -> None:
+    """Подписывает счетчики запросов на события всех движков SQLAlchemy"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def _observe_latency(status_code: int) -> None:
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_LATENCY.labels(
+            request.endpoint or 'unmatched', request.method, str(status_code),
+        ).observe(time.perf_counter() - started)
+
+
+def _observe_request(response):
+    _observe_latency(response.status_code)
+    return response
+
+
+def _observe_failed_request(exception):
+    # необработанное исключение, после которого after_request не вызывался (или сам after_request упал)
+    if exception is not None:
+        _observe_latency(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def metrics_view():
+    """Метрики в текстовом формате Prometheus; при PROMETHEUS_MULTIPROC_DIR - суммарно по всем воркерам"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app) -> None:
+    """
+    Метод включает сбор метрик: латентность запросов по эндпоинтам, счетчики SQL и эндпоинт /metrics
+    @param app: приложение Flask
+    """
+    instrument_database()
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_request)
+    app.teardown_request(_observe_failed_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
+
+
+def _start_request_counters():
+    g.request_counters = dict(db=0, redis=0)
+
+
+def _set_request_counters_headers(response):
+    counters = g.get('request_counters')
+    if counters is not None:
+        response.headers[DB_QUERIES_HEADER] = str(counters['db'])
+        response.headers[REDIS_CALLS_HEADER] = str(counters['redis'])
+
+    return response
+
+
+def init_request_counters(app) -> None:
+    """
+    Метод включает подсчет SQL-запросов и обращений к Redis (пайплайн - одно обращение) в каждом запросе
+    и отдает их в заголовках X-DB-Queries и X-Redis-Calls, по ним тесты проверяют бюджеты эндпоинтов
+    @param app: приложение Flask
+    """
+    instrument_database()
+    app.before_request(_start_request_counters)
+    app.after_request(_set_request_counters_headers)
@@ -0,0 +1,167 @@
+import os
+import socket
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from redis import Redis
+
+from project.utils.instrumentation import uncounted_calls
+
+LIMITER_WORKERS_KEY = 'ratelimit:workers'
+# Доля лимита воркера: DEMAND_WEIGHT делится пропорционально спросу на ключ, остаток - поровну между воркерами,
+# чтобы воркер, к которому ключ пока не приходил, не остался без квоты
+DEMAND_WEIGHT = 0.8
+
+
+class TokenBucket:
+    __slots__ = ('limit', 'interval', 'share', 'tokens', 'updated', 'window', 'used', 'consumed', 'demand')
+
+    def __init__(self, limit: int, interval: int, share: float, tokens: float, updated: float, window: int):
+        self.limit = limit
+        self.interval = interval
+        # доля лимита этого воркера
+        self.share = share
+        self.tokens = tokens
+        self.updated = updated
+        # окно счетчика в Redis и число запросов всех воркеров в нем на момент последней синхронизации
+        self.window = window
+        self.used = 0
+        # пропущенные и все пришедшие запросы с последней синхронизации
+        self.consumed = 0
+        self.demand = 0
+
+
+class LocalPreLimiter:
+    """
+    Локальный rate limiter воркера: запросы пропускаются и отклоняются без обращения к Redis.
+    Каждому ключу достается token bucket на долю лимита воркера (limit * share * slack). Доля пересчитывается
+    при синхронизации из числа живых воркеров и спроса на ключ в каждом из них. Раз в sync_interval секунд
+    воркер одним пайплайном отмечается в реестре воркеров и прибавляет пропущенные запросы к счетчику окна
+    ключа в Redis, а в ответ получает общий счетчик окна: исчерпав лимит на все воркеры, ключ отклоняется
+    до конца окна. Лимит приблизительный: превышение ограничено запросами, пропущенными за sync_interval.
+    """
+
+    def __init__(self, client: Redis, max_keys: int, sync_interval: float, slack: float):
+        self._client = client
+        self._max_keys = max_keys
+        self._sync_interval = sync_interval
+        self._slack = slack
+        self._lock = threading.Lock()
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._workers = 1
+        self._synced_at: t.Optional[float] = None
+
+    def allow(self, keys: t.Sequence[t.Tuple[str, int, int]]) -> t.Tuple[bool, int, float, int, t.Optional[str]]:
+        """
+        Метод списывает по токену из локальных ведер всех ключей, только если их пропускают все ключи
+        @param keys: список (ключ, лимит запросов за интервал на все воркеры, интервал в секундах)
+        @return: (запрос пропущен, оценка остатка лимита, через сколько секунд повторить, лимит, отказавший ключ)
+        """
+        self._sync_if_stale()
+        now = time.monotonic()
+        wall_clock = time.time()
+
+        with self._lock:
+            buckets = []
+            for key, limit, interval in keys:
+                bucket = self._bucket(key, limit, interval, now, wall_clock)
+                bucket.demand += 1
+                if bucket.used + bucket.consumed >= limit:
+                    self._evict()
+                    return False, 0, (bucket.window + 1) * interval - wall_clock, limit, key
+                if bucket.tokens < 1:
+                    self._evict()
+                    return False, 0, (1 - bucket.tokens) * interval / self._capacity(bucket), limit, key
+                buckets.append(bucket)
+
+            for bucket in buckets:
+                bucket.tokens -= 1
+                bucket.consumed += 1
+            self._evict()
+            tightest = min(buckets, key=lambda b: b.limit - b.used - b.consumed)
+            return True, max(0, tightest.limit - tightest.used - tightest.consumed), 0.0, tightest.limit, None
+
+    def _capacity(self, bucket: TokenBucket) -> float:
+        return max(1.0, bucket.limit * bucket.share * self._slack)
+
+    def _bucket(self, key: str, limit: int, interval: int, now: float, wall_clock: float) -> TokenBucket:
+        window = int(wall_clock // interval)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.limit != limit or bucket.interval != interval:
+            bucket = TokenBucket(limit, interval, share=1 / self._workers, tokens=0.0, updated=now, window=window)
+            bucket.tokens = self._capacity(bucket)
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+            capacity = self._capacity(bucket)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * capacity / interval)
+            bucket.updated = now
+
+        if bucket.window != window:
+            bucket.window = window
+            bucket.used = 0
+        return bucket
+
+    @staticmethod
+    def _worker_id() -> str:
+        # воркер определяется по pid на момент синхронизации, чтобы форк получил свой идентификатор
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _evict(self) -> None:
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+    @uncounted_calls()
+    def _sync_if_stale(self) -> None:
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self._sync_interval:
+            return
+
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self._sync_interval:
+                return
+            self._synced_at = now
+            # в Redis уходят только ключи, к которым были запросы с прошлой синхронизации
+            active = []
+            for key, bucket in self._buckets.items():
+                if bucket.demand:
+                    active.append((key, bucket.interval, bucket.consumed, bucket.demand))
+                    bucket.consumed = bucket.demand = 0
+
+        worker = self._worker_id()
+        wall_clock = time.time()
+        expired = wall_clock - 3 * self._sync_interval
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zadd(LIMITER_WORKERS_KEY, {worker: wall_clock})
+        pipe.zremrangebyscore(LIMITER_WORKERS_KEY, '-inf', expired)
+        pipe.zcard(LIMITER_WORKERS_KEY)
+        for key, interval, consumed, demand in active:
+            counter_key = f'{key}:{int(wall_clock // interval)}'
+            pipe.incrby(counter_key, consumed)
+            pipe.expire(counter_key, 2 * interval)
+            pipe.hset(f'{key}:demand', worker, f'{demand}:{wall_clock}')
+            pipe.pexpire(f'{key}:demand', int(3 * self._sync_interval * 1000))
+            pipe.hgetall(f'{key}:demand')
+        results = pipe.execute()
+
+        with self._lock:
+            self._workers = max(1, results[2])
+            for i, (key, interval, _, demand) in enumerate(active):
+                used, _, _, _, demands = results[3 + 5 * i:8 + 5 * i]
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                # спрос воркеров, не синхронизировавшихся три интервала, не учитывается
+                total = 0
+                for value in demands.values():
+                    count, synced_at = value.split(b':')
+                    if float(synced_at) > expired:
+                        total += int(count)
+                bucket.share = DEMAND_WEIGHT * demand / max(demand, total) + (1 - DEMAND_WEIGHT) / self._workers
+                bucket.tokens = min(bucket.tokens, self._capacity(bucket))
+                window = int(wall_clock // interval)
+                if bucket.window <= window:
+                    bucket.window = window
+                    bucket.used = used
@@ -1,14 +1,43 @@
-from ua_parser import user_agent_parser
+import re
+import typing as t
+from functools import lru_cache
+
 from werkzeug.user_agent import UserAgent
 from werkzeug.utils import cached_property
 
 from project import settings
 
+# Типовые строки браузеров, для которых ua-parser гарантированно возвращает известное семейство ОС.
+# Скобка с платформой и хвост из стандартных токенов браузера должны совпасть целиком:
+# все, что сюда не подходит (боты, дистрибутивы Linux, Windows Phone, встроенные браузеры), разбирает ua-parser.
+_BROWSER_TAIL = (
+    r'(?: (?:\(KHTML, like Gecko\)|like Gecko|'
+    r'(?:AppleWebKit|Chrome|Safari|Version|Mobile|Firefox|Gecko|Edg|EdgA|EdgiOS|OPR|CriOS|FxiOS|YaBrowser)'
+    r'(?:/[\w.]+)?))*$'
+)
+_FAST_PATH = tuple(
+    (re.compile(rf'^Mozilla/5\.0 \({platform}\){_BROWSER_TAIL}'), family)
+    for platform, family in (
+        (r'Windows NT 10\.0; (?:Win64; x64|WOW64)(?:; rv:[\d.]+)?', 'Windows'),
+        (r'X11; Linux x86_64(?:; rv:[\d.]+)?', 'Linux'),
+        (r'Linux; Android \d+(?:\.\d+)*(?:; (?:K|SM-[A-Z]\d+[A-Z]?|Pixel \d+(?: Pro)?))?', 'Android'),
+        (r'(?:iPhone; CPU iPhone|iPad; CPU) OS \d+(?:_\d+)* like Mac OS X', 'iOS'),
+        (r'Macintosh; Intel Mac OS X \d+(?:[_.]\d+)*(?:; rv:[\d.]+)?', 'Mac OS X'),
+    )
+)
+
+
+def _parse(user_agent: str) -> dict:
+    # таблица регулярных выражений ua-parser компилируется при импорте, поэтому загружается при первом разборе
+    from ua_parser import user_agent_parser
+
+    return user_agent_parser.Parse(user_agent)
+
 
 class ParsedUserAgent(UserAgent):
     @cached_property
     def _details(self):
-        return user_agent_parser.Parse(self.string)
+        return _parse(self.string)
 
     @property
     def platform(self) -> str:
@@ -27,13 +56,27 @@ class ParsedUserAgent(UserAgent):
         )
 
 
-def get_platform(user_agent: str) -> str:
+def get_os_family(user_agent: str) -> str:
+    """
+    Метод определения семейства ОС: типовые строки браузеров распознаются без ua-parser
+    @param user_agent: строка user_agent из запроса
+    @return: семейство ОС в терминах ua-parser
+    """
+    for pattern, family in _FAST_PATH:
+        if pattern.match(user_agent):
+            return family
+
+    return ParsedUserAgent(user_agent).platform
+
+
+@lru_cache(maxsize=settings.USER_AGENT_CACHE_SIZE)
+def get_platform(user_agent: t.Optional[str]) -> str:
     """
     Метод вычитки платформы, с которой поступил запрос
     @param user_agent: строка user_agent из запроса
     @return: тип платформы в соответствии с описанными ограничениями
     """
-    platform = ParsedUserAgent(user_agent).platform.lower()
+    platform = get_os_family(user_agent or '').lower()
     if platform not in settings.PLATFORMS_TUPLE:
         return 'other'
 
@@ -1,42 +1,215 @@
-import time
+import math
+import typing as t
 from functools import wraps
 from http import HTTPStatus
 
-from flask import abort, request
+from flask import abort, g, request
 from flask_jwt_extended import get_jwt
 
-from project import redis
+from project import redis, settings
+from project.core.metrics import RATE_LIMIT_REJECTIONS
+from project.utils.local_limiter import LocalPreLimiter
 
+SLIDING_LOG = 'sliding_log'
+SLIDING_WINDOW = 'sliding_window'
+GCRA = 'gcra'
+ALGORITHMS = (SLIDING_LOG, SLIDING_WINDOW, GCRA)
 
-def rate_limit(limit: int = 10, interval: int = 60, by_email: bool = False, by_ip: bool = False):
+# Проверка всех ключей и списание запроса за один вызов EVALSHA.
+# KEYS - ключи лимитов, ARGV[1] - алгоритм, далее пары (limit, interval в мс) на каждый ключ.
+# Запрос списывается только если его пропускают все ключи.
+# Возвращает {allowed, remaining, retry_after_ms, limit, denied_key_index}.
+RATE_LIMIT_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local algorithm = ARGV[1]
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local allowed = 1
+local remaining = nil
+local tightest_limit = 0
+local retry_after = 0
+local denied = 0
+local state = {}
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local interval = tonumber(ARGV[2 * i + 1])
+    local ok, left, retry
+
+    if algorithm == 'sliding_log' then
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - interval)
+        local count = redis.call('ZCARD', key)
+        ok = count < limit
+        left = limit - count - 1
+        retry = 0
+        if not ok then
+            local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+            retry = tonumber(oldest[2]) + interval - now
+        end
+        state[i] = count
+    elseif algorithm == 'sliding_window' then
+        local window = math.floor(now / interval)
+        local elapsed = now - window * interval
+        local counts = redis.call('HMGET', key, window, window - 1)
+        local current = tonumber(counts[1]) or 0
+        local previous = tonumber(counts[2]) or 0
+        local estimate = previous * (interval - elapsed) / interval + current
+        ok = estimate + 1 <= limit
+        left = math.floor(limit - estimate - 1)
+        retry = 0
+        if not ok then
+            if current + 1 > limit or previous == 0 then
+                retry = interval - elapsed
+            else
+                retry = math.ceil((interval - elapsed) - (limit - 1 - current) * interval / previous)
+            end
+        end
+        state[i] = window
+    else
+        local emission = interval / limit
+        local tat = tonumber(redis.call('GET', key)) or now
+        if tat < now then
+            tat = now
+        end
+        local new_tat = tat + emission
+        local allow_at = new_tat - interval
+        ok = now >= allow_at
+        left = math.floor((now - allow_at) / emission)
+        retry = math.ceil(allow_at - now)
+        state[i] = new_tat
+    end
+
+    if remaining == nil or left < remaining then
+        remaining = left
+        tightest_limit = limit
+    end
+    if not ok then
+        allowed = 0
+        if retry > retry_after then
+            retry_after = retry
+            denied = i
+        end
+        if denied == 0 then
+            denied = i
+        end
+    end
+end
+
+if allowed == 1 then
+    for i, key in ipairs(KEYS) do
+        local interval = tonumber(ARGV[2 * i + 1])
+        if algorithm == 'sliding_log' then
+            redis.call('ZADD', key, now, now .. '-' .. state[i])
+            redis.call('PEXPIRE', key, interval)
+        elseif algorithm == 'sliding_window' then
+            redis.call('HINCRBY', key, state[i], 1)
+            redis.call('HDEL', key, state[i] - 2)
+            redis.call('PEXPIRE', key, 2 * interval)
+        else
+            redis.call('SET', key, state[i], 'PX', math.ceil(state[i] - now))
+        end
+    end
+end
+
+if remaining == nil or remaining < 0 then
+    remaining = 0
+end
+return {allowed, remaining, retry_after, tightest_limit, denied}
+"""
+
+rate_limit_script = redis.register_script(RATE_LIMIT_SCRIPT)
+
+local_limiter = LocalPreLimiter(
+    redis,
+    max_keys=settings.LOCAL_RATE_LIMIT_MAX_KEYS,
+    sync_interval=settings.LOCAL_RATE_LIMIT_SYNC_SECONDS,
+    slack=settings.LOCAL_RATE_LIMIT_SLACK,
+)
+
+
+class RateLimitResult(t.NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+    limit: int
+    denied_key: t.Optional[str]
+
+
+def check_rate_limits(keys: t.List[t.Tuple[str, int, int]], algorithm: str) -> RateLimitResult:
+    """
+    Метод атомарно проверяет набор лимитов и списывает запрос со всех ключей
+    @param keys: список (ключ, лимит, интервал в секундах)
+    @param algorithm: sliding_log, sliding_window или gcra
+    @return: результат проверки
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f'unknown rate limit algorithm: {algorithm}')
+
+    args = [algorithm]
+    for _, limit, interval in keys:
+        args.extend((limit, interval * 1000))
+    allowed, remaining, retry_after_ms, limit, denied = rate_limit_script(keys=[key for key, _, _ in keys], args=args)
+
+    return RateLimitResult(
+        allowed=bool(allowed),
+        remaining=remaining,
+        retry_after=retry_after_ms / 1000,
+        limit=limit,
+        denied_key=keys[denied - 1][0] if denied else None,
+    )
+
+
+def set_rate_limit_headers(response):
+    """after_request-хук: проставляет заголовки лимитов, посчитанные декоратором rate_limit"""
+    headers = g.get('rate_limit_headers')
+    if headers:
+        response.headers.extend(headers)
+
+    return response
+
+
+def rate_limit(limit: int = 10, interval: int = 60, by_email: bool = False, by_ip: bool = False,
+               global_limit: t.Optional[int] = None, algorithm: t.Optional[str] = None):
     """
     Rate limiter для запросов от пользователя
     @param limit: лимит подключений за интервал
     @param interval: интервал в секундах
     @param by_email: условие ограничения по почтовому ящику
     @param by_ip: условие ограничения по ip
+    @param global_limit: общий лимит запросов к эндпоинту за интервал
+    @param algorithm: алгоритм ограничения, по умолчанию settings.RATE_LIMIT_ALGORITHM
     """
     def rate_limit_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            if by_email or by_ip:
-                prefix = ''
-                if by_email:
-                    email = get_jwt()['sub']
-                    prefix = f'{prefix}{email}:'
-                if by_ip:
-                    prefix = f'{prefix}{request.remote_addr}:'
-                t = int(time.time())
-                closest_minute = t - (t % interval)
-                key = f'{prefix}{closest_minute}'
-                current = redis.get(key)
-                if current and int(current) > limit:
-                    abort(HTTPStatus.TOO_MANY_REQUESTS, f'Too many requests for {prefix.rstrip(":")}')
-
-                pipe = redis.pipeline()
-                pipe.incr(key, 1)
-                pipe.expire(key, interval + 1)
-                pipe.execute()
+            algo = algorithm or settings.RATE_LIMIT_ALGORITHM
+            keys = []
+            if by_email:
+                keys.append((f'ratelimit:{algo}:email:{get_jwt()["sub"]}', limit, interval))
+            if by_ip:
+                keys.append((f'ratelimit:{algo}:ip:{request.remote_addr}', limit, interval))
+            if global_limit:
+                keys.append((f'ratelimit:{algo}:global:{f.__name__}', global_limit, interval))
+
+            if keys:
+                # локальный лимитер отвечает без обращения к Redis, точный EVALSHA - только при его отключении
+                if settings.LOCAL_RATE_LIMIT_ENABLED:
+                    layer, result = 'local', RateLimitResult(*local_limiter.allow(keys))
+                else:
+                    layer, result = 'redis', check_rate_limits(keys, algo)
+                headers = {
+                    'X-RateLimit-Limit': str(result.limit),
+                    'X-RateLimit-Remaining': str(result.remaining),
+                }
+                if not result.allowed:
+                    headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+                g.rate_limit_headers = headers
+                if not result.allowed:
+                    RATE_LIMIT_REJECTIONS.labels(layer, result.denied_key.split(':')[2]).inc()
+                    abort(HTTPStatus.TOO_MANY_REQUESTS, f'Too many requests for {result.denied_key.split(":", 2)[2]}')
 
             return f(*args, **kwargs)
 
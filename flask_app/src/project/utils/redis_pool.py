@@ -0,0 +1,71 @@
+import time
+
+from redis import BlockingConnectionPool, StrictRedis, UnixDomainSocketConnection
+from redis.client import Pipeline
+
+from project.core.config import settings
+from project.core.metrics import REDIS_COMMAND_LATENCY, REDIS_POOL_WAIT
+from project.utils.instrumentation import count_request_call
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Блокирующий пул соединений, измеряющий время ожидания свободного соединения"""
+
+    def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            return super().get_connection(command_name, *keys, **options)
+        finally:
+            REDIS_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        count_request_call('redis')
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_LATENCY.labels('PIPELINE').observe(time.perf_counter() - started)
+
+
+class InstrumentedRedis(StrictRedis):
+    """Клиент Redis, пишущий латентность каждой команды в гистограмму"""
+
+    def execute_command(self, *args, **options):
+        count_request_call('redis')
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def create_redis_client() -> InstrumentedRedis:
+    """
+    Метод создает общий для всего приложения клиент Redis с настройками пула из Settings
+    @return: клиент Redis
+    """
+    connection_kwargs = dict(
+        db=settings.REDIS_DB,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    if settings.REDIS_UNIX_SOCKET_PATH:
+        connection_kwargs.update(connection_class=UnixDomainSocketConnection, path=settings.REDIS_UNIX_SOCKET_PATH)
+    else:
+        connection_kwargs.update(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        )
+
+    pool = InstrumentedConnectionPool(
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **connection_kwargs,
+    )
+    return InstrumentedRedis(connection_pool=pool)
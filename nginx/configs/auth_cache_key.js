@@ -0,0 +1,11 @@
+// Ключ кэша вердиктов auth_request: SHA-256 заголовка Authorization.
+// Ключ proxy_cache_key хранится в файле кэша открытым текстом, поэтому сам токен в ключ не попадает
+function tokenHash(r) {
+    var authorization = r.headersIn.Authorization;
+    if (!authorization) {
+        return '';
+    }
+    return require('crypto').createHash('sha256').update(authorization).digest('hex');
+}
+
+export default {tokenHash};
@@ -0,0 +1,102 @@
+"""
+Микробенчмарк определения платформы по User-Agent.
+Сравнивает полный разбор ua-parser, быстрый путь без кэша и get_platform с LRU-кэшем на корпусе
+с распределением, похожим на реальный трафик, и проверяет, что все варианты дают одинаковую платформу.
+
+Запуск из flask_app/src:
+    python ../../tests/benchmarks/bench_user_agent.py [--requests 50000] [--seed 42]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'flask_app' / 'src'))
+
+from ua_parser import user_agent_parser  # noqa: E402
+
+from project import settings  # noqa: E402
+from project.utils.parsed_user_agent import get_os_family, get_platform  # noqa: E402
+
+CHROME = 'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36'
+SAFARI = 'AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{v}.1 Safari/605.1.15'
+MOBILE_SAFARI = 'AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{v}.0 Mobile/15E148 Safari/604.1'
+
+# (шаблон, вес): {v} подставляется номером версии, чтобы получить несколько сотен различных строк
+TEMPLATES = (
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' + CHROME, 30),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' + CHROME + ' Edg/{v}.0.0.0', 8),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:{v}.0) Gecko/20100101 Firefox/{v}.0', 6),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' + CHROME + ' YaBrowser/{v}.1.0.0', 5),
+    ('Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36', 20),  # noqa: E501
+    ('Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36', 4),  # noqa: E501
+    ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_{v} like Mac OS X) ' + MOBILE_SAFARI, 12),
+    ('Mozilla/5.0 (iPad; CPU OS 16_{v} like Mac OS X) ' + MOBILE_SAFARI, 2),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) ' + SAFARI, 6),
+    ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:{v}.0) Gecko/20100101 Firefox/{v}.0', 2),
+    ('Mozilla/5.0 (X11; Linux x86_64) ' + CHROME, 3),
+    ('Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:{v}.0) Gecko/20100101 Firefox/{v}.0', 1),
+    ('Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) ' + CHROME, 1),
+    ('Mozilla/5.0 (Windows Phone 10.0; Android 6.0.1; Microsoft; Lumia 950) ' + CHROME + ' Edge/{v}.0', 1),
+    ('Mozilla/5.0 (Linux; Android {v}; SM-G960F Build/R16NW; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/99.0 Mobile Safari/537.36', 1),  # noqa: E501
+    ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)', 1),
+    ('python-requests/2.{v}.0', 1),
+    ('okhttp/4.{v}.0', 1),
+    ('', 1),
+)
+
+
+def build_corpus(requests: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    templates, weights = zip(*TEMPLATES)
+    # версии распределены неравномерно: большинство клиентов на свежих версиях
+    return [
+        rnd.choices(templates, weights)[0].format(v=100 + int(rnd.paretovariate(1.5)) % 20)
+        for _ in range(requests)
+    ]
+
+
+def normalize(family: str) -> str:
+    platform = family.lower()
+    return platform if platform in settings.PLATFORMS_TUPLE else 'other'
+
+
+def measure(name: str, func, corpus: list) -> None:
+    started = time.perf_counter()
+    for user_agent in corpus:
+        func(user_agent)
+    elapsed = time.perf_counter() - started
+    print(f'{name:<28} {len(corpus) / elapsed:>12,.0f} ops/sec  {elapsed / len(corpus) * 1e6:>8.2f} us/op')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.requests, args.seed)
+    distinct = sorted(set(corpus))
+
+    mismatches = [
+        user_agent for user_agent in distinct
+        if normalize(get_os_family(user_agent)) != normalize(user_agent_parser.Parse(user_agent)['os']['family'])
+    ]
+    print(f'requests: {len(corpus)}, distinct user agents: {len(distinct)}')
+
+    measure('ua-parser Parse', lambda ua: normalize(user_agent_parser.Parse(ua)['os']['family']), corpus)
+    measure('fast path + ua-parser', lambda ua: normalize(get_os_family(ua)), corpus)
+    get_platform.cache_clear()
+    measure('get_platform (LRU)', get_platform, corpus)
+    print(f'LRU: {get_platform.cache_info()}')
+
+    if mismatches:
+        print('platform mismatch with ua-parser:', *mismatches, sep='\n  ')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Микробенчмарки горячих путей Auth API внутри процесса.
+Запросы идут через тестовый клиент Flask, Redis подменяется fakeredis (клиент и пул приложения сохраняются,
+меняется только класс соединения), база - локальный Postgres с настройками DB_* приложения.
+Для каждого бенчмарка считаются ops/sec, p50 и p99, результат сохраняется в JSON и сравнивается с базовой линией.
+
+Запуск из корня репозитория (лучше на отдельной базе, таблицы создаются при отсутствии):
+    DB_NAME=auth_bench python tests/benchmarks/run.py --output bench.json
+Без Postgres выполняются только бенчмарки, которым база не нужна:
+    python tests/benchmarks/run.py --skip-db
+Обновить базовую линию после осознанного изменения производительности:
+    DB_NAME=auth_bench python tests/benchmarks/run.py --update-baseline
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import typing as t
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(ROOT), str(ROOT / 'flask_app' / 'src')]
+
+import fakeredis  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.dialects.postgresql import insert  # noqa: E402
+
+from project import create_app, database, redis  # noqa: E402
+from project.core.roles import USER_DEFAULT_ROLE  # noqa: E402
+from project.extensions import build_additional_claims  # noqa: E402
+from project.models.models import Role, User  # noqa: E402
+from project.services.password_hasher import password_hasher  # noqa: E402
+from project.utils.parsed_user_agent import get_platform  # noqa: E402
+from project.utils.rate_limiter import rate_limit  # noqa: E402
+from tests.benchmarks.bench_user_agent import build_corpus  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+BENCH_PASSWORD = 'bench-password'
+# у каждого HTTP-бенчмарка свои пользователи: лимиты rate limiter по email (10 в минуту) не пересекаются
+USERS_PER_BENCHMARK = 200
+WARMUP_SHARE = 0.1
+
+
+class Benchmark(t.NamedTuple):
+    name: str
+    iterations: int
+    run: t.Callable[[int], None]
+
+
+class Client:
+    """Тестовый клиент с уникальным адресом на каждый запрос, чтобы не упираться в лимиты по ip"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+        self._requests = 0
+
+    def request(self, method: str, path: str, token: t.Optional[str] = None, json_body: t.Optional[dict] = None):
+        self._requests += 1
+        ip = f'10.{self._requests >> 16 & 255}.{self._requests >> 8 & 255}.{self._requests & 255}'
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self._client.open(path, method=method, headers=headers, json=json_body,
+                                     environ_base={'REMOTE_ADDR': ip})
+        if response.status_code != 200:
+            raise RuntimeError(f'{method} {path}: {response.status_code} {response.get_data(as_text=True)}')
+
+        return response
+
+
+def use_fake_redis() -> None:
+    pool = redis.connection_pool
+    pool.connection_class = fakeredis.FakeConnection
+    pool.connection_kwargs['server'] = fakeredis.FakeServer()
+    pool.reset()
+
+
+def prepare_users(app, count: int) -> t.List[User]:
+    with app.app_context():
+        database.create_all()
+
+    result = app.test_cli_runner().invoke(args=['roles', 'create'])
+    if result.exit_code:
+        raise RuntimeError(result.output)
+
+    with app.app_context():
+        role_id = Role.query.filter_by(name=USER_DEFAULT_ROLE).first().id
+        # один хэш на всех пользователей, как в flask perfdata generate
+        password_hashed = password_hasher.hash(BENCH_PASSWORD)
+        statement = insert(User.__table__).values([
+            dict(id=uuid.uuid4(), email=f'bench{index:05d}@bench.local', password_hashed=password_hashed,
+                 disabled=False, role_id=role_id)
+            for index in range(count)
+        ])
+        database.session.execute(statement.on_conflict_do_update(
+            index_elements=['email'],
+            set_=dict(password_hashed=password_hashed, disabled=False, role_id=role_id),
+        ))
+        database.session.commit()
+        users = User.query.filter(User.email.like('bench%@bench.local')).order_by(User.email).limit(count).all()
+        database.session.expunge_all()
+
+    return users
+
+
+def access_tokens(app, users: t.List[User], count: int) -> t.List[str]:
+    with app.app_context():
+        return [
+            create_access_token(identity=user.email, additional_claims=build_additional_claims(user))
+            for user in (users[index % len(users)] for index in range(count))
+        ]
+
+
+def http_benchmarks(app, scale: float) -> t.List[Benchmark]:
+    client = Client(app)
+    names = ('login', 'logout', 'check_access', 'user_read', 'roles_list')
+    users = prepare_users(app, USERS_PER_BENCHMARK * len(names))
+    slices = {name: users[index::len(names)] for index, name in enumerate(names)}
+
+    def total(iterations: int) -> int:
+        return int(iterations * scale) + int(iterations * scale * WARMUP_SHARE)
+
+    login_users = slices['login']
+    logout_tokens = access_tokens(app, slices['logout'], total(500))
+    read_tokens = {name: access_tokens(app, slices[name], USERS_PER_BENCHMARK)
+                   for name in ('check_access', 'user_read', 'roles_list')}
+    user_read_paths = [f'/api/v1/users/{user.id}' for user in slices['user_read']]
+
+    return [
+        Benchmark('login', int(100 * scale), lambda i: client.request(
+            'POST', '/api/v1/auth/login',
+            json_body=dict(email=login_users[i % len(login_users)].email, password=BENCH_PASSWORD),
+        )),
+        Benchmark('logout', int(500 * scale), lambda i: client.request(
+            'DELETE', '/api/v1/auth/logout', token=logout_tokens[i],
+        )),
+        Benchmark('check_access', int(1000 * scale), lambda i: client.request(
+            'GET', '/api/v1/users/check_access', token=read_tokens['check_access'][i % USERS_PER_BENCHMARK],
+        )),
+        Benchmark('user_read', int(1000 * scale), lambda i: client.request(
+            'GET', user_read_paths[i % USERS_PER_BENCHMARK],
+            token=read_tokens['user_read'][i % USERS_PER_BENCHMARK],
+        )),
+        Benchmark('roles_list', int(1000 * scale), lambda i: client.request(
+            'GET', '/api/v1/roles/', token=read_tokens['roles_list'][i % USERS_PER_BENCHMARK],
+        )),
+    ]
+
+
+def local_benchmarks(app, scale: float) -> t.List[Benchmark]:
+    corpus = build_corpus(int(200000 * scale) * 2, seed=42)
+    get_platform.cache_clear()
+
+    @rate_limit(limit=10 ** 9, interval=60, by_ip=True)
+    def limited():
+        return None
+
+    def call_limited(i: int) -> None:
+        with app.test_request_context(environ_base={'REMOTE_ADDR': f'192.168.{i >> 8 & 3}.{i & 255}'}):
+            limited()
+
+    return [
+        Benchmark('get_platform', int(200000 * scale), lambda i: get_platform(corpus[i])),
+        Benchmark('rate_limit', int(5000 * scale), call_limited),
+    ]
+
+
+def measure(benchmark: Benchmark) -> dict:
+    warmup = int(benchmark.iterations * WARMUP_SHARE)
+    for index in range(warmup):
+        benchmark.run(index)
+
+    timings = []
+    started = time.perf_counter()
+    for index in range(warmup, warmup + benchmark.iterations):
+        call_started = time.perf_counter()
+        benchmark.run(index)
+        timings.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return dict(
+        iterations=benchmark.iterations,
+        ops_per_sec=round(benchmark.iterations / elapsed, 1),
+        p50_ms=round(percentiles[49] * 1000, 6),
+        p99_ms=round(percentiles[98] * 1000, 6),
+    )
+
+
+def compare(results: t.Dict[str, dict], baseline: t.Dict[str, dict], tolerance: float) -> t.List[str]:
+    """
+    Метод сравнивает результаты с базовой линией
+    @param tolerance: допустимое относительное падение ops/sec и рост p99
+    @return: имена бенчмарков с регрессией
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f'{name:<14} no baseline')
+            continue
+
+        ops_change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        p99_change = result['p99_ms'] / base['p99_ms'] - 1
+        regressed = ops_change < -tolerance or p99_change > tolerance
+        print(f'{name:<14} ops/sec {ops_change:>+8.1%}  p99 {p99_change:>+8.1%}{"  REGRESSION" if regressed else ""}')
+        if regressed:
+            regressions.append(name)
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', type=Path, help='Where to write results JSON')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Write results into the baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the number of iterations')
+    parser.add_argument('--skip-db', action='store_true', help='Run only benchmarks that do not need Postgres')
+    parser.add_argument('--only', nargs='*', help='Benchmark names to run')
+    args = parser.parse_args()
+
+    app = create_app()
+    use_fake_redis()
+
+    benchmarks = local_benchmarks(app, args.scale)
+    if not args.skip_db:
+        with app.app_context():
+            database.session.execute(text('SELECT 1'))
+        benchmarks += http_benchmarks(app, args.scale)
+
+    results = {}
+    for benchmark in benchmarks:
+        if args.only and benchmark.name not in args.only:
+            continue
+        results[benchmark.name] = measure(benchmark)
+        result = results[benchmark.name]
+        print(f'{benchmark.name:<14} {result["ops_per_sec"]:>12,.1f} ops/sec  '
+              f'p50 {result["p50_ms"]:>9.3f} ms  p99 {result["p99_ms"]:>9.3f} ms')
+
+    report = dict(
+        meta=dict(
+            created=datetime.utcnow().isoformat(timespec='seconds'),
+            python=platform.python_version(),
+            machine=platform.machine(),
+            scale=args.scale,
+        ),
+        results=results,
+    )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text())['results'] if args.baseline.exists() else {}
+        report['results'] = {**baseline, **results}
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        return 0
+
+    if not args.baseline.exists():
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text())['results'], args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
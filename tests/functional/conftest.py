@@ -49,13 +49,16 @@ async def session():
 
 @pytest.fixture(scope='function')
 def make_get_request():
-    async def inner(method: str, headers: dict = {}) -> HTTPResponse:
+    async def inner(method: str, headers: dict = {}, data: t.Optional[dict] = None,
+                    params: t.Optional[dict] = None) -> HTTPResponse:
         headers = {'Content-Type': 'application/json', **headers}
         url = f'{settings.api_host.rstrip("/")}:{settings.api_port}/api/v1{method}'
         async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url) as response:
+            async with session.get(url, data=json.dumps(data) if data is not None else None,
+                                   params=params) as response:
                 return HTTPResponse(
-                    body=await response.json(),
+                    # у ответов без тела (например, 204 от /auth/verify) нет JSON
+                    body=await response.json() if response.content_type == 'application/json' else None,
                     headers=response.headers,
                     status=response.status,
                 )
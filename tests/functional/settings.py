@@ -16,6 +16,9 @@ class TestSettings(BaseSettings):
 
     jwt_secret_key: str = Field('eyJhbGciOiJSUzI1NiIsImNsYXNzaWQiOjQ5Nn0', env='JWT_SECRET_KEY')
     jwt_algorithms: str = Field('HS256', env='JWT_ALGORITHMS')
+    # должен совпадать с REFRESH_MIN_INTERVAL_SECONDS сервиса (docker-compose-dev.yml)
+    refresh_min_interval_seconds: float = Field(1, env='REFRESH_MIN_INTERVAL_SECONDS')
+    auth_verify_cache_seconds: int = Field(30, env='AUTH_VERIFY_CACHE_SECONDS')
 
     def get_api_url(self):
         return f'{self.api_host}/{self.api_port}'.rstrip('/')
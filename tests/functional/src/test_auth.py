@@ -1,3 +1,5 @@
+import asyncio
+import math
 from http import HTTPStatus
 
 import jwt
@@ -20,7 +22,7 @@ class TestAuth:
                                            data=login_data)
 
         assert response.status == HTTPStatus.OK
-        assert list(response.body.keys()) == ['token']
+        assert sorted(response.body.keys()) == ['refresh_token', 'token']
         assert response.headers is not None
 
     async def test_login_no_data_fail(self, make_post_request):
@@ -68,3 +70,114 @@ class TestAuth:
 
         assert response.status == HTTPStatus.UNAUTHORIZED
         assert response.body['msg'] == 'Token has been revoked'
+
+    async def test_verify_success(self, make_get_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id, role_id FROM users WHERE email='{login_data['email']}';")
+        user = db_cursor.fetchone()
+        response = await make_get_request('/auth/verify', headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.NO_CONTENT
+        assert response.headers['X-User-Id'] == user['id']
+        assert response.headers['X-Role-Id'] == user['role_id']
+        # nginx кэширует положительный вердикт не дольше AUTH_VERIFY_CACHE_SECONDS
+        cache_control = response.headers['Cache-Control']
+        assert cache_control.startswith('max-age=')
+        assert 0 < int(cache_control[len('max-age='):]) <= settings.auth_verify_cache_seconds
+        assert response.headers['Vary'] == 'Authorization'
+
+    async def test_verify_without_token_fail(self, make_get_request):
+        response = await make_get_request('/auth/verify')
+
+        assert response.status == HTTPStatus.UNAUTHORIZED
+        assert response.headers['Cache-Control'] == 'no-store'
+        assert 'X-User-Id' not in response.headers
+
+    async def test_verify_after_logout_fail(self, make_get_request, make_delete_request, actual_token):
+        await make_delete_request('/auth/logout',
+                                  headers={'Authorization': f'Bearer {actual_token}'})
+
+        response = await make_get_request('/auth/verify', headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.UNAUTHORIZED
+        assert response.headers['Cache-Control'] == 'no-store'
+
+    async def test_refresh_rotation(self, make_post_request, actual_token):
+        login = await make_post_request('/auth/login',
+                                        data=login_data)
+        refresh_token = login.body['refresh_token']
+        await asyncio.sleep(settings.refresh_min_interval_seconds)
+
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {refresh_token}'})
+
+        assert response.status == HTTPStatus.OK
+        assert sorted(response.body.keys()) == ['refresh_token', 'token']
+        assert response.body['refresh_token'] != refresh_token
+
+    async def test_refresh_too_often_fail(self, make_post_request, actual_token):
+        login = await make_post_request('/auth/login',
+                                        data=login_data)
+
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {login.body["refresh_token"]}'})
+
+        assert response.status == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.body['description'] == 'tokens of this session were refreshed too recently'
+        assert 1 <= int(response.headers['Retry-After']) <= math.ceil(settings.refresh_min_interval_seconds)
+
+        # после Retry-After тот же токен ротируется: отказ по интервалу не отзывает семью
+        await asyncio.sleep(int(response.headers['Retry-After']))
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {login.body["refresh_token"]}'})
+        assert response.status == HTTPStatus.OK
+
+    async def test_refresh_retry_with_previous_token(self, make_post_request, actual_token):
+        login = await make_post_request('/auth/login',
+                                        data=login_data)
+        refresh_token = login.body['refresh_token']
+        await asyncio.sleep(settings.refresh_min_interval_seconds)
+        await make_post_request('/auth/refresh',
+                                headers={'Authorization': f'Bearer {refresh_token}'})
+
+        # ответ на первое обновление потерялся, клиент повторяет запрос со старым токеном
+        retried = await make_post_request('/auth/refresh',
+                                          headers={'Authorization': f'Bearer {refresh_token}'})
+        assert retried.status == HTTPStatus.OK
+
+        await asyncio.sleep(settings.refresh_min_interval_seconds)
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {retried.body["refresh_token"]}'})
+        assert response.status == HTTPStatus.OK
+
+    async def test_refresh_reuse_revokes_session(self, make_post_request, actual_token):
+        login = await make_post_request('/auth/login',
+                                        data=login_data)
+        refresh_token = login.body['refresh_token']
+        await asyncio.sleep(settings.refresh_min_interval_seconds)
+        rotated = await make_post_request('/auth/refresh',
+                                          headers={'Authorization': f'Bearer {refresh_token}'})
+        await asyncio.sleep(settings.refresh_min_interval_seconds)
+        rotated = await make_post_request('/auth/refresh',
+                                          headers={'Authorization': f'Bearer {rotated.body["refresh_token"]}'})
+
+        # токен двумя ротациями раньше уже не предыдущий: окно повтора на него не распространяется
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status == HTTPStatus.UNAUTHORIZED
+        assert response.body['description'] == 'refresh token has already been used, session revoked'
+
+        # вместе со старым токеном отозвана вся семья
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {rotated.body["refresh_token"]}'})
+        assert response.status == HTTPStatus.UNAUTHORIZED
+        assert response.body['description'] == 'session expired or revoked'
+
+    async def test_logout_revokes_refresh_token(self, make_post_request, make_delete_request, actual_token):
+        login = await make_post_request('/auth/login',
+                                        data=login_data)
+        await make_delete_request('/auth/logout',
+                                  headers={'Authorization': f'Bearer {login.body["token"]}'})
+
+        response = await make_post_request('/auth/refresh',
+                                           headers={'Authorization': f'Bearer {login.body["refresh_token"]}'})
+        assert response.status == HTTPStatus.UNAUTHORIZED
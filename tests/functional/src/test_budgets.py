@@ -0,0 +1,91 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.functional.testdata.auth_data import login_data
+
+pytestmark = pytest.mark.asyncio
+
+DB_QUERIES_HEADER = 'X-DB-Queries'
+REDIS_CALLS_HEADER = 'X-Redis-Calls'
+
+# Бюджеты на один запрос с прогретыми кэшами: (SQL-запросов, обращений к Redis).
+# Периодические синхронизации воркера (фильтр отозванных токенов, матрица доступа, счетчики локального лимитера)
+# в счетчики запроса не попадают, поэтому бюджеты точные:
+# rate limiter обслуживает запросы из локальных квот воркера и в бюджет не входит;
+# login - пользователь из БД и семья refresh-токенов;
+# check_access - без обращений, состояние пользователя берется из локального кэша;
+# чтение ролей - версия матрицы доступа и ключ кэша ролей.
+BUDGETS = {
+    'login': (1, 1),
+    'check_access': (0, 0),
+    'get_user': (1, 0),
+    'get_user_role': (1, 2),
+    'get_roles': (0, 2),
+    'get_role': (0, 2),
+}
+
+
+def assert_within_budget(name: str, response):
+    assert DB_QUERIES_HEADER in response.headers, 'API must be started with REQUEST_COUNTERS_HEADERS=true'
+    max_queries, max_redis_calls = BUDGETS[name]
+    queries = int(response.headers[DB_QUERIES_HEADER])
+    redis_calls = int(response.headers[REDIS_CALLS_HEADER])
+
+    assert queries <= max_queries, f'{name}: {queries} SQL queries, budget {max_queries}'
+    assert redis_calls <= max_redis_calls, f'{name}: {redis_calls} Redis calls, budget {max_redis_calls}'
+
+
+class TestBudgets:
+
+    async def test_login_budget(self, make_post_request, actual_token):
+        response = await make_post_request('/auth/login', data=login_data)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('login', response)
+
+    async def test_check_access_budget(self, make_get_request, actual_token):
+        headers = {'Authorization': f'Bearer {actual_token}'}
+        await make_get_request('/users/check_access', headers=headers)
+        response = await make_get_request('/users/check_access', headers=headers)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('check_access', response)
+
+    async def test_get_user_budget(self, make_get_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
+        user_id = db_cursor.fetchone().pop()
+        headers = {'Authorization': f'Bearer {actual_token}'}
+        await make_get_request(f'/users/{user_id}', headers=headers)
+        response = await make_get_request(f'/users/{user_id}', headers=headers)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('get_user', response)
+
+    async def test_get_user_role_budget(self, make_get_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
+        user_id = db_cursor.fetchone().pop()
+        headers = {'Authorization': f'Bearer {actual_token}'}
+        await make_get_request(f'/users/{user_id}/role', headers=headers)
+        response = await make_get_request(f'/users/{user_id}/role', headers=headers)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('get_user_role', response)
+
+    async def test_get_roles_budget(self, make_get_request, actual_token):
+        headers = {'Authorization': f'Bearer {actual_token}'}
+        await make_get_request('/roles/', headers=headers)
+        response = await make_get_request('/roles/', headers=headers)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('get_roles', response)
+
+    async def test_get_role_budget(self, make_get_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM roles;")
+        role_id = db_cursor.fetchone().pop()
+        headers = {'Authorization': f'Bearer {actual_token}'}
+        await make_get_request(f'/roles/{role_id}', headers=headers)
+        response = await make_get_request(f'/roles/{role_id}', headers=headers)
+
+        assert response.status == HTTPStatus.OK
+        assert_within_budget('get_role', response)
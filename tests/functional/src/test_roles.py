@@ -63,6 +63,27 @@ class TestRoles:
         assert response.body['name'] == new_role_unique_name
         assert response.headers is not None
 
+    async def test_update_role_permission_twice(self, make_post_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM permissions;")
+        permission_id = db_cursor.fetchone().pop()
+        role_unique_name = str(uuid.uuid4())
+        data = create_role(name=role_unique_name, permission_id=permission_id)
+        response = await make_post_request('/roles/create',
+                                           data=data,
+                                           headers={'Authorization': f'Bearer {actual_token}'})
+
+        role_id = response.body['id']
+
+        for value in ('true', 'false'):
+            data['permissions'][0]['value'] = value
+            response = await make_post_request(f'/roles/{role_id}',
+                                               data=data,
+                                               headers={'Authorization': f'Bearer {actual_token}'})
+            assert response.status == HTTPStatus.OK
+
+        db_cursor.execute(f"SELECT value FROM role_permission WHERE role_id='{role_id}';")
+        assert [row['value'] for row in db_cursor.fetchall()] == ['false']
+
     async def test_get_role(self, make_get_request, actual_token, db_cursor):
         db_cursor.execute(f"SELECT id, name FROM roles;")
         role_id, role_name = db_cursor.fetchone()
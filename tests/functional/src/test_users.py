@@ -2,9 +2,10 @@ from http import HTTPStatus
 
 import pytest
 
-from tests.functional.testdata.auth_data import login_data
+from tests.functional.testdata.auth_data import login_data, super_user_role_name, user_role_name
 from tests.functional.testdata.users_data import (
-    register_data, passwords_mismatch_data, register_base_data, update_user_data,
+    register_data, passwords_mismatch_data, register_base_data, update_user_data, pagination_users_data,
+    demoted_user_data,
 )
 
 pytestmark = pytest.mark.asyncio
@@ -55,6 +56,39 @@ class TestUsers:
         assert list(response.body.pop().keys()) == ['disabled', 'email', 'id']
         assert response.headers is not None
 
+    async def test_get_users_pagination(self, make_get_request, make_post_request, actual_token):
+        # на второй странице должен оказаться хотя бы один пользователь
+        for data in pagination_users_data:
+            await make_post_request('/users/register', data=data)
+
+        response = await make_get_request('/users/', params={'per_page': 1},
+                                          headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.OK
+        assert len(response.body) == 1
+
+        next_cursor = response.headers.get('X-Next-Cursor')
+        assert next_cursor is not None
+        next_page = await make_get_request('/users/', params={'per_page': 1, 'cursor': next_cursor},
+                                           headers={'Authorization': f'Bearer {actual_token}'})
+        assert next_page.status == HTTPStatus.OK
+        assert next_page.body[0]['email'] > response.body[0]['email']
+
+    @pytest.mark.parametrize('per_page', [0, -1, 1000])
+    async def test_get_users_invalid_per_page_fail(self, make_get_request, actual_token, per_page):
+        response = await make_get_request('/users/', params={'per_page': per_page},
+                                          headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.BAD_REQUEST
+        assert 'per_page' in response.body['messages']['query']
+
+    async def test_get_users_invalid_cursor_fail(self, make_get_request, actual_token):
+        response = await make_get_request('/users/', params={'cursor': 'not-a-cursor'},
+                                          headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.EXPECTATION_FAILED
+        assert response.body['description'] == 'cursor is invalid'
+
     async def test_get_user_success(self, make_get_request, actual_token, db_cursor):
         db_cursor.execute("SELECT id, email, disabled FROM users;")
         user_id, email, disabled = db_cursor.fetchone()
@@ -112,16 +146,60 @@ class TestUsers:
         assert response.body['role_id'] != user_role_id
         assert response.body['role_id'] == new_role_id
 
+    async def test_demoted_user_old_token_fail(self, make_get_request, make_post_request, make_put_request,
+                                               actual_token, db_cursor):
+        admin_headers = {'Authorization': f'Bearer {actual_token}'}
+        response = await make_post_request('/users/register', data=demoted_user_data)
+        user_id = response.body['id']
+        db_cursor.execute(f"SELECT id FROM roles where name='{super_user_role_name}';")
+        superuser_role_id = db_cursor.fetchone().pop()
+        db_cursor.execute(f"SELECT id FROM roles where name='{user_role_name}';")
+        user_role_id = db_cursor.fetchone().pop()
+        await make_put_request(f'/users/{user_id}/role/{superuser_role_id}', headers=admin_headers)
+
+        login = await make_post_request('/auth/login', data={'email': demoted_user_data['email'],
+                                                             'password': demoted_user_data['password']})
+        headers = {'Authorization': f'Bearer {login.body["token"]}'}
+        response = await make_get_request('/users/', headers=headers)
+        assert response.status == HTTPStatus.OK
+
+        # после понижения роли токен с маской пермишенов суперпользователя проверяется по новой роли
+        await make_put_request(f'/users/{user_id}/role/{user_role_id}', headers=admin_headers)
+        response = await make_get_request('/users/', headers=headers)
+
+        assert response.status == HTTPStatus.FORBIDDEN
+
     async def test_get_user_history(self, make_get_request, actual_token, db_cursor):
         db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
         user_id = db_cursor.fetchone().pop()
         response = await make_get_request(f'/users/{user_id}/history',
                                           headers={'Authorization': f'Bearer {actual_token}'})
 
-        assert list(response.body.keys()) == ['history', 'page', 'per_page']
+        assert list(response.body.keys()) == ['history', 'next_cursor', 'per_page']
         assert isinstance(response.body['history'], list)
         assert list(response.body['history'][0].keys()) == ['activity', 'created']
 
+    async def test_get_user_history_invalid_cursor(self, make_get_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
+        user_id = db_cursor.fetchone().pop()
+        response = await make_get_request(f'/users/{user_id}/history',
+                                          data={'cursor': 'invalid'},
+                                          headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.EXPECTATION_FAILED
+        assert response.body['description'] == 'cursor is invalid'
+
+    @pytest.mark.parametrize('per_page', [0, -1, 1000])
+    async def test_get_user_history_invalid_per_page_fail(self, make_get_request, actual_token, db_cursor, per_page):
+        db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
+        user_id = db_cursor.fetchone().pop()
+        response = await make_get_request(f'/users/{user_id}/history',
+                                          data={'per_page': per_page},
+                                          headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.BAD_REQUEST
+        assert 'per_page' in response.body['messages']['json']
+
     async def test_check_access(self, make_get_request, actual_token):
         response = await make_get_request('/users/check_access', headers={'Authorization': f'Bearer {actual_token}'})
 
@@ -129,3 +207,17 @@ class TestUsers:
 
         assert response.body == {'message': 'Success'}
         assert response.headers is not None
+
+    async def test_check_access_batch(self, make_post_request, actual_token, db_cursor):
+        db_cursor.execute(f"SELECT id FROM users where email='{login_data['email']}';")
+        user_id = db_cursor.fetchone().pop()
+        response = await make_post_request('/users/check_access/batch',
+                                           data={'tokens': [actual_token, 'not-a-token']},
+                                           headers={'Authorization': f'Bearer {actual_token}'})
+
+        assert response.status == HTTPStatus.OK
+        valid, invalid = response.body['results']
+        assert valid['valid'] is True
+        assert valid['user_id'] == str(user_id)
+        assert 'user_all_read' in valid['permissions']
+        assert invalid == {'valid': False, 'reason': 'token invalid'}
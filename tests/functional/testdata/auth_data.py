@@ -4,6 +4,7 @@ login_data = {
 }
 
 super_user_role_name = 'superuser'
+user_role_name = 'user'
 
 login_wrong_email_data = {
     "email": 'wrong',
@@ -18,9 +18,24 @@ register_base_data = {
     "email": "user@admin.admin",
 }
 
+demoted_user_data = {
+    "password": "password",
+    "password_confirm": "password",
+    "email": f"{uuid.uuid4()}@demoted.admin",
+}
+
 update_user_data = {
     "old_password": "password",
     "new_password_confirm": "password1",
     "new_password": "password1",
     "email": f"{uuid.uuid4()}@admin.admin",
 }
+
+pagination_users_data = [
+    {
+        "password": "password",
+        "password_confirm": "password",
+        "email": f"{uuid.uuid4()}@pagination.admin",
+    }
+    for _ in range(2)
+]
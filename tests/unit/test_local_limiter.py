@@ -0,0 +1,134 @@
+import fakeredis
+import pytest
+
+from project.utils import local_limiter as local_limiter_module
+from project.utils.local_limiter import LIMITER_WORKERS_KEY, LocalPreLimiter
+
+SYNC_INTERVAL = 5
+KEY = 'ratelimit:sliding_window:ip:10.0.0.1'
+
+
+class Clock:
+    """Подменяет модуль time в лимитере: время двигает тест"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+class CountingRedis:
+    """Клиент Redis, считающий обращения: пайплайн - одно обращение, как и отдельная команда"""
+
+    def __init__(self, server: fakeredis.FakeServer):
+        self.client = fakeredis.FakeRedis(server=server)
+        self.calls = 0
+
+    def pipeline(self, transaction: bool = True):
+        pipe = self.client.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        def counted_execute(*args, **kwargs):
+            self.calls += 1
+            return execute(*args, **kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+    def __getattr__(self, name):
+        self.calls += 1
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(local_limiter_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_limiter(server, worker: str, monkeypatch) -> LocalPreLimiter:
+    limiter = LocalPreLimiter(CountingRedis(server), max_keys=100, sync_interval=SYNC_INTERVAL, slack=1.0)
+    monkeypatch.setattr(limiter, '_worker_id', lambda: worker)
+    return limiter
+
+
+class TestLocalPreLimiter:
+
+    def test_hot_key_redis_calls_are_bounded(self, clock, server, monkeypatch):
+        limiter = make_limiter(server, 'w1', monkeypatch)
+        clock.now = 60 * 20000.0
+        allowed = 0
+
+        # 10000 запросов горячего ключа за 100 секунд: 100 запросов в секунду при лимите 600 в минуту
+        for _ in range(10000):
+            allowed += limiter.allow([(KEY, 600, 60)])[0]
+            clock.now += 0.01
+
+        assert limiter._client.calls <= 100 / SYNC_INTERVAL + 1
+        # за 100 секунд открылось два окна по 60 секунд
+        assert 600 < allowed <= 2 * 600
+
+    def test_over_limit_key_is_rejected_until_window_end(self, clock, server, monkeypatch):
+        limiter = make_limiter(server, 'w1', monkeypatch)
+        clock.now = 60 * 20000.0
+
+        results = [limiter.allow([(KEY, 10, 60)]) for _ in range(11)]
+
+        assert all(result[0] for result in results[:10])
+        allowed, remaining, retry_after, limit, denied_key = results[10]
+        assert not allowed
+        assert (remaining, limit, denied_key) == (0, 10, KEY)
+        assert retry_after > 0
+
+        # после синхронизации общий счетчик окна исчерпан: отказ до конца окна, а не до нового токена
+        clock.now += SYNC_INTERVAL
+        allowed, _, retry_after, _, _ = limiter.allow([(KEY, 10, 60)])
+        assert not allowed
+        assert retry_after == pytest.approx(60 - SYNC_INTERVAL)
+
+        clock.now += 60
+        assert limiter.allow([(KEY, 10, 60)])[0]
+
+    def test_request_is_charged_only_if_all_keys_allow(self, clock, server, monkeypatch):
+        limiter = make_limiter(server, 'w1', monkeypatch)
+        other = 'ratelimit:sliding_window:global:login'
+
+        assert limiter.allow([(KEY, 1, 60)])[0]
+        allowed, _, _, _, denied_key = limiter.allow([(other, 10, 60), (KEY, 1, 60)])
+
+        assert not allowed
+        assert denied_key == KEY
+        assert limiter._buckets[other].consumed == 0
+
+    def test_share_follows_demand(self, clock, server, monkeypatch):
+        hot = make_limiter(server, 'w1', monkeypatch)
+        cold = make_limiter(server, 'w2', monkeypatch)
+        hot.allow([(KEY, 1000, 60)])
+        cold.allow([(KEY, 1000, 60)])
+        assert fakeredis.FakeRedis(server=server).zcard(LIMITER_WORKERS_KEY) == 2
+
+        # доли сходятся со второй синхронизации, когда каждый воркер видит спрос другого
+        for _ in range(2):
+            for _ in range(90):
+                hot.allow([(KEY, 1000, 60)])
+            for _ in range(9):
+                cold.allow([(KEY, 1000, 60)])
+            clock.now += SYNC_INTERVAL
+            hot.allow([(KEY, 1000, 60)])
+            cold.allow([(KEY, 1000, 60)])
+
+        # спрос 91 к 10: горячему воркеру достается большая часть лимита, доли в сумме дают весь лимит
+        hot_share = hot._buckets[KEY].share
+        cold_share = cold._buckets[KEY].share
+        assert hot_share > 0.75 > 0.25 > cold_share
+        assert hot_share + cold_share == pytest.approx(1)
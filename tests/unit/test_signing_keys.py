@@ -0,0 +1,139 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from flask import Flask
+
+from project.api.well_known import routes as well_known_routes
+from project.api.well_known import well_known_blueprint
+from project.services.signing_keys import KEY_FILE_SUFFIX, KID_TIME_FORMAT, SigningKeys, generate_key
+
+ACTIVATION_DELAY = 900
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_key(keys_dir, created: datetime, algorithm: str = 'RS256') -> str:
+    """Создает ключ и переименовывает его так, чтобы kid содержал заданное время создания"""
+    kid = generate_key(str(keys_dir), algorithm)
+    created_kid = f'{created:{KID_TIME_FORMAT}}-{kid.split("-")[1]}'
+    os.rename(keys_dir / f'{kid}{KEY_FILE_SUFFIX}', keys_dir / f'{created_kid}{KEY_FILE_SUFFIX}')
+    return created_kid
+
+
+def load_keys(keys_dir, algorithm: str = 'RS256') -> SigningKeys:
+    keys = SigningKeys(algorithm, str(keys_dir), activation_delay=ACTIVATION_DELAY, reload_interval=3600)
+    keys.load()
+    return keys
+
+
+@pytest.fixture
+def jwks_client(monkeypatch):
+    def inner(keys: SigningKeys):
+        monkeypatch.setattr(well_known_routes, 'signing_keys', keys)
+        app = Flask(__name__)
+        app.register_blueprint(well_known_blueprint, url_prefix='/.well-known')
+        return app.test_client()
+
+    return inner
+
+
+class TestSigningKeys:
+
+    def test_active_key_waits_for_activation(self, tmp_path):
+        old_kid = make_key(tmp_path, T0)
+        new_kid = make_key(tmp_path, T0 + timedelta(days=1))
+        keys = load_keys(tmp_path)
+        new_created = (T0 + timedelta(days=1)).timestamp()
+
+        # новый ключ уже опубликован, но подписывает старый, пока не прошла задержка активации
+        assert keys.active(now=new_created).kid == old_kid
+        assert keys.active(now=new_created + ACTIVATION_DELAY - 1).kid == old_kid
+        assert keys.active(now=new_created + ACTIVATION_DELAY).kid == new_kid
+
+    def test_single_pending_key_is_active(self, tmp_path):
+        kid = make_key(tmp_path, T0)
+        keys = load_keys(tmp_path)
+
+        # без более старого ключа новый подписывает сразу, иначе токены выпускать было бы нечем
+        assert keys.active(now=T0.timestamp()).kid == kid
+
+    def test_retired(self, tmp_path):
+        old_kid = make_key(tmp_path, T0)
+        make_key(tmp_path, T0 + timedelta(days=1))
+        keys = load_keys(tmp_path)
+        retention = timedelta(hours=1)
+        replaced_at = (T0 + timedelta(days=1)).timestamp() + ACTIVATION_DELAY
+
+        assert keys.retired(retention, now=replaced_at) == []
+        assert keys.retired(retention, now=replaced_at + retention.total_seconds() - 1) == []
+        assert [key.kid for key in keys.retired(retention, now=replaced_at + retention.total_seconds())] == [old_kid]
+
+    def test_newest_key_is_never_retired(self, tmp_path):
+        make_key(tmp_path, T0)
+        keys = load_keys(tmp_path)
+
+        assert keys.retired(timedelta(0), now=(T0 + timedelta(days=365)).timestamp()) == []
+
+    def test_foreign_pem_file_is_skipped(self, tmp_path):
+        kid = make_key(tmp_path, T0)
+        os.link(tmp_path / f'{kid}{KEY_FILE_SUFFIX}', tmp_path / f'server{KEY_FILE_SUFFIX}')
+        keys = load_keys(tmp_path)
+
+        assert [key.kid for key in keys.keys] == [kid]
+
+    def test_no_keys(self, tmp_path):
+        keys = SigningKeys('RS256', str(tmp_path), activation_delay=ACTIVATION_DELAY, reload_interval=3600)
+
+        with pytest.raises(RuntimeError):
+            keys.load()
+
+
+class TestJwks:
+
+    def test_hs256_jwks_is_empty(self, tmp_path, jwks_client):
+        keys = SigningKeys('HS256', str(tmp_path), activation_delay=ACTIVATION_DELAY, reload_interval=3600)
+        response = jwks_client(keys).get('/.well-known/jwks.json')
+
+        assert response.status_code == 200
+        assert response.json == {'keys': []}
+        assert response.cache_control.public
+
+    def test_jwks_publishes_all_keys_newest_first(self, tmp_path, jwks_client):
+        old_kid = make_key(tmp_path, T0)
+        new_kid = make_key(tmp_path, T0 + timedelta(days=1))
+        response = jwks_client(load_keys(tmp_path)).get('/.well-known/jwks.json')
+
+        assert response.status_code == 200
+        assert [jwk['kid'] for jwk in response.json['keys']] == [new_kid, old_kid]
+        for jwk in response.json['keys']:
+            assert jwk['alg'] == 'RS256'
+            assert jwk['use'] == 'sig'
+            assert 'key_ops' not in jwk
+            assert 'd' not in jwk
+
+    def test_jwks_conditional_request(self, tmp_path, jwks_client):
+        make_key(tmp_path, T0)
+        client = jwks_client(load_keys(tmp_path))
+        etag = client.get('/.well-known/jwks.json').headers['ETag']
+
+        response = client.get('/.well-known/jwks.json', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize('algorithm', ['RS256', 'EdDSA'])
+    def test_sign_and_verify_with_jwks(self, tmp_path, jwks_client, algorithm):
+        make_key(tmp_path, T0, algorithm)
+        make_key(tmp_path, T0 + timedelta(days=1), algorithm)
+        keys = load_keys(tmp_path, algorithm)
+        active = keys.active()
+        token = jwt.encode({'sub': 'user@admin.admin'}, active.private_key, algorithm=algorithm,
+                           headers={'kid': active.kid})
+
+        # сторонний сервис проверяет токен только по JWKS: ключ ищется по kid из заголовка
+        jwks = json.loads(jwks_client(keys).get('/.well-known/jwks.json').data)
+        kid = jwt.get_unverified_header(token)['kid']
+        jwk = next(jwk for jwk in jwks['keys'] if jwk['kid'] == kid)
+        claims = jwt.decode(token, jwt.PyJWK(jwk).key, algorithms=[jwk['alg']])
+
+        assert claims == {'sub': 'user@admin.admin'}
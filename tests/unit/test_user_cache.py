@@ -0,0 +1,101 @@
+import fakeredis
+import pytest
+
+from project.services import user_cache as user_cache_module
+from project.services.user_cache import USER_STATE_KEY_PREFIX, UserState, UserStateCache
+
+USER_A = 'aaaaaaaa-0000-0000-0000-000000000000'
+USER_B = 'bbbbbbbb-0000-0000-0000-000000000000'
+ROLE_ADMIN = 'admin-role'
+ROLE_USER = 'user-role'
+
+
+class FakeUsers:
+    """Таблица users в памяти: id -> (email, role_id)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = 0
+
+    def _row(self, identity, user_id):
+        self.queries += 1
+        if user_id:
+            return user_id, self.rows.get(user_id)
+        for row_id, row in self.rows.items():
+            if row[0] == identity:
+                return row_id, row
+        return None, None
+
+    def load(self, identity, user_id):
+        row_id, row = self._row(identity, user_id)
+        if not row:
+            return None, None
+        return UserState(id=row_id, role_id=row[1], disabled=False), row[0]
+
+    def load_many(self, identities):
+        loaded = {}
+        for identity, user_id in identities:
+            state, email = self.load(identity, user_id)
+            if state:
+                loaded[(identity, user_id)] = (state, email)
+        return loaded
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = FakeUsers()
+    monkeypatch.setattr(user_cache_module, 'redis', fakeredis.FakeRedis())
+    monkeypatch.setattr(UserStateCache, '_load', staticmethod(users.load))
+    monkeypatch.setattr(UserStateCache, '_load_many', staticmethod(users.load_many))
+    return users
+
+
+@pytest.fixture
+def cache():
+    return UserStateCache(max_size=100, local_ttl=60, redis_ttl=300)
+
+
+class TestUserStateCache:
+
+    def test_hit_skips_database(self, users, cache):
+        users.rows[USER_A] = ('x@test', ROLE_ADMIN)
+
+        assert cache.get('x@test', USER_A).id == USER_A
+        assert cache.get('x@test', USER_A).id == USER_A
+        assert users.queries == 1
+
+    def test_reused_email_is_not_served_from_old_owner_token(self, users, cache):
+        # пользователь A сменил email x на y, затем x занял пользователь B
+        users.rows[USER_A] = ('y@test', ROLE_ADMIN)
+        users.rows[USER_B] = ('x@test', ROLE_USER)
+
+        # уцелевший токен A (sub=x) находит A по id, но не кэширует его под x
+        state = cache.get('x@test', USER_A)
+        assert state.id == USER_A
+        assert user_cache_module.redis.get(f'{USER_STATE_KEY_PREFIX}x@test') is None
+
+        state = cache.get('x@test', USER_B)
+        assert state.id == USER_B
+        assert state.role_id == ROLE_USER
+
+    def test_cached_state_of_other_user_is_a_miss(self, users, cache):
+        users.rows[USER_A] = ('y@test', ROLE_ADMIN)
+        users.rows[USER_B] = ('x@test', ROLE_USER)
+        # состояние A осталось под x, например, записано до смены email
+        user_cache_module.redis.set(f'{USER_STATE_KEY_PREFIX}x@test', UserState(USER_A, ROLE_ADMIN, False).dumps())
+
+        state = cache.get('x@test', USER_B)
+        assert state.id == USER_B
+        assert state.role_id == ROLE_USER
+        # строка B найдена по id и email по-прежнему ее: кэш исправлен
+        assert UserState.loads(user_cache_module.redis.get(f'{USER_STATE_KEY_PREFIX}x@test')).id == USER_B
+
+    def test_get_many_reused_email(self, users, cache):
+        users.rows[USER_A] = ('y@test', ROLE_ADMIN)
+        users.rows[USER_B] = ('x@test', ROLE_USER)
+
+        states = cache.get_many([('x@test', USER_A), ('x@test', USER_B)])
+
+        assert states[('x@test', USER_A)].id == USER_A
+        assert states[('x@test', USER_B)].id == USER_B
+        assert UserState.loads(user_cache_module.redis.get(f'{USER_STATE_KEY_PREFIX}x@test')).id == USER_B